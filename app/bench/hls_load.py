@@ -0,0 +1,172 @@
+"""HLS load test: N simulated players against the nginx cache vs. MediaMTX.
+
+Each simulated player behaves like hls.js: it polls the media playlist about
+once per target duration and downloads every segment it has not fetched yet,
+starting near the live edge. For each player count in ``--players`` the test
+runs for ``--duration`` seconds and reports client request rate and the rate
+of requests that actually reached MediaMTX.
+
+Behind nginx, the upstream count comes from the ``X-Cache-Status`` header that
+``nginx/default.conf`` adds. MISS, EXPIRED, BYPASS and REVALIDATED mean nginx
+went to MediaMTX. STALE means it served the old copy and started a background
+refresh. Against MediaMTX directly (``--url http://localhost:8888/...``) there
+is no header, so every request counts as upstream. With the cache working, the
+upstream rate stays roughly flat as the number of players grows.
+
+Usage::
+
+    python bench/hls_load.py --players 1,10,50 --duration 30
+    python bench/hls_load.py --url http://localhost:8888/cam/index.m3u8 --players 1,10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin
+
+UPSTREAM_STATUSES = {None, "MISS", "EXPIRED", "BYPASS", "REVALIDATED", "STALE"}
+
+
+class Tally:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.bytes = 0
+
+    def add(self, status: Optional[str], size: int) -> None:
+        with self.lock:
+            self.statuses[status] += 1
+            self.bytes += size
+
+    def error(self) -> None:
+        with self.lock:
+            self.errors += 1
+
+
+def _get(url: str, tally: Tally, timeout: float) -> Optional[bytes]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            body = resp.read()
+            tally.add(resp.headers.get("X-Cache-Status"), len(body))
+            return body
+    except (urllib.error.URLError, OSError):
+        tally.error()
+        return None
+
+
+def _parse_playlist(text: str) -> Tuple[float, List[str], List[str]]:
+    """Return ``(target_duration, variant_uris, segment_uris)``."""
+
+    target = 2.0
+    variants: List[str] = []
+    segments: List[str] = []
+    expect_variant = False
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-TARGETDURATION:"):
+            target = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-STREAM-INF"):
+            expect_variant = True
+        elif line and not line.startswith("#"):
+            (variants if expect_variant else segments).append(line)
+            expect_variant = False
+    return target, variants, segments
+
+
+def _resolve_media_playlist(url: str, tally: Tally, timeout: float) -> str:
+    body = _get(url, tally, timeout)
+    if body is None:
+        raise SystemExit(f"could not fetch {url}; is the stream up?")
+    _target, variants, _segments = _parse_playlist(body.decode("utf-8", "replace"))
+    return urljoin(url, variants[0]) if variants else url
+
+
+def _player(playlist_url: str, tally: Tally, stop: threading.Event, timeout: float) -> None:
+    seen: set = set()
+    first = True
+    while not stop.is_set():
+        started = time.monotonic()
+        body = _get(playlist_url, tally, timeout)
+        target = 2.0
+        if body is not None:
+            target, _variants, segments = _parse_playlist(body.decode("utf-8", "replace"))
+            # Like a live player, start three segments from the edge.
+            fresh = segments[-3:] if first else [s for s in segments if s not in seen]
+            first = False
+            for uri in fresh:
+                if stop.is_set():
+                    break
+                _get(urljoin(playlist_url, uri), tally, timeout)
+            seen.update(segments)
+        stop.wait(max(0.0, target - (time.monotonic() - started)))
+
+
+def run_step(playlist_url: str, players: int, duration: float, timeout: float) -> dict:
+    tally = Tally()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_player, args=(playlist_url, tally, stop, timeout), daemon=True)
+        for _ in range(players)
+    ]
+    started = time.monotonic()
+    for index, thread in enumerate(threads):
+        thread.start()
+        # Spread the players over a second so they do not poll in lockstep.
+        time.sleep(min(1.0 / players, 0.05) if index < players - 1 else 0)
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout + 1)
+    elapsed = time.monotonic() - started
+
+    requests = sum(tally.statuses.values())
+    upstream = sum(count for status, count in tally.statuses.items() if status in UPSTREAM_STATUSES)
+    return {
+        "players": players,
+        "seconds": round(elapsed, 2),
+        "requests_per_s": requests / elapsed,
+        "upstream_per_s": upstream / elapsed,
+        "hit_ratio": (requests - upstream) / requests if requests else None,
+        "mbit_per_s": tally.bytes * 8 / elapsed / 1e6,
+        "errors": tally.errors,
+        "statuses": {str(k): v for k, v in sorted(tally.statuses.items(), key=lambda kv: str(kv[0]))},
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--url", default="http://localhost:8282/hls/cam/index.m3u8", help="playlist URL")
+    parser.add_argument("--players", default="1,10,50", help="comma-separated player counts to run")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per player count")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per step")
+    args = parser.parse_args(argv)
+
+    counts = [int(n) for n in args.players.split(",") if n.strip()]
+    playlist_url = _resolve_media_playlist(args.url, Tally(), args.timeout)
+    if not args.json:
+        print(f"media playlist: {playlist_url}")
+        print(f"{'players':>7} {'req/s':>8} {'upstream/s':>10} {'hit%':>6} {'Mbit/s':>8} {'errors':>6}")
+    for players in counts:
+        result = run_step(playlist_url, players, args.duration, args.timeout)
+        if args.json:
+            print(json.dumps(result))
+            continue
+        hit = "-" if result["hit_ratio"] is None else f"{result['hit_ratio'] * 100:.0f}"
+        print(
+            f"{players:>7} {result['requests_per_s']:>8.1f} {result['upstream_per_s']:>10.2f} "
+            f"{hit:>6} {result['mbit_per_s']:>8.1f} {result['errors']:>6}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
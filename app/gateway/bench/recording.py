@@ -0,0 +1,150 @@
+"""Recording benchmark: disk throughput and CPU per camera, plus index/seek cost.
+
+Watches the recordings directory for ``--duration`` seconds while MediaMTX is
+recording and reports, per camera, the bytes written per second. CPU is taken
+from the MediaMTX process (``--pid``, auto-detected from ``/proc`` on the host,
+or ``--docker <container>``) and divided by the number of cameras that wrote
+data during the window. Afterwards it times a cold index build over the
+archive and a batch of random seeks.
+
+Usage::
+
+    python bench/recording.py --root ../recordings --duration 60
+    python bench/recording.py --root ../recordings --docker mediamtx
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import recordings  # noqa: E402
+
+
+def _find_pid(name: str) -> Optional[int]:
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/comm", encoding="ascii") as fh:
+                if fh.read().strip() == name:
+                    return int(entry.name)
+        except OSError:
+            continue
+    return None
+
+
+def _proc_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat", encoding="ascii") as fh:
+        fields = fh.read().rsplit(")", 1)[1].split()
+    # utime and stime are fields 14/15 (1-based) of the full line.
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _docker_cpu_percent(container: str) -> Optional[float]:
+    out = subprocess.run(
+        ["docker", "stats", "--no-stream", "--format", "{{.CPUPerc}}", container],
+        capture_output=True, text=True, check=False,
+    ).stdout.strip()
+    try:
+        return float(out.rstrip("%"))
+    except ValueError:
+        return None
+
+
+def _archive_bytes(root: Path) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for camera in recordings.RecordingArchive(root).cameras():
+        total = 0
+        for entry in os.scandir(root / camera):
+            if recordings.parse_segment_start(entry.name) is not None:
+                total += entry.stat().st_size
+        totals[camera] = total
+    return totals
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark recording throughput, CPU and seek cost.")
+    parser.add_argument("--root", type=Path, default=Path("/recordings"))
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--pid", type=int, default=None, help="MediaMTX pid (default: find 'mediamtx' in /proc)")
+    parser.add_argument("--docker", metavar="CONTAINER", help="read CPU from 'docker stats' instead of /proc")
+    parser.add_argument("--seeks", type=int, default=1000)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON only")
+    args = parser.parse_args(argv)
+
+    pid = None if args.docker else (args.pid or _find_pid("mediamtx"))
+    before = _archive_bytes(args.root)
+    cpu_before = _proc_cpu_seconds(pid) if pid else None
+    started = time.monotonic()
+    docker_samples = []
+    while time.monotonic() - started < args.duration:
+        if args.docker:
+            sample = _docker_cpu_percent(args.docker)
+            if sample is not None:
+                docker_samples.append(sample)
+        time.sleep(min(5.0, args.duration))
+    elapsed = time.monotonic() - started
+    after = _archive_bytes(args.root)
+
+    # Byte deltas go negative when eviction runs mid-window; clamp per camera.
+    throughput = {cam: max(0, after.get(cam, 0) - before.get(cam, 0)) / elapsed for cam in after}
+    active = [cam for cam, rate in throughput.items() if rate > 0]
+    if pid is not None and cpu_before is not None:
+        cpu_percent: Optional[float] = (_proc_cpu_seconds(pid) - cpu_before) / elapsed * 100
+    elif docker_samples:
+        cpu_percent = sum(docker_samples) / len(docker_samples)
+    else:
+        cpu_percent = None
+
+    archive = recordings.RecordingArchive(args.root)
+    segments = [s for cam in archive.cameras() for s in archive.segments(cam)]
+    t0 = time.perf_counter()
+    for segment in segments:
+        archive.index(segment)
+    index_seconds = time.perf_counter() - t0
+    seek_us = None
+    if segments:
+        lo, hi = segments[0].start, segments[-1].start + 1
+        cams = archive.cameras()
+        t0 = time.perf_counter()
+        for _ in range(args.seeks):
+            archive.seek(random.choice(cams), random.uniform(lo, hi))
+        seek_us = (time.perf_counter() - t0) / args.seeks * 1e6
+
+    result = {
+        "window_s": elapsed,
+        "cameras_active": len(active),
+        "bytes_per_s": throughput,
+        "mbit_per_s_total": sum(throughput.values()) * 8 / 1e6,
+        "mediamtx_cpu_percent": cpu_percent,
+        "cpu_percent_per_camera": (cpu_percent / len(active)) if cpu_percent is not None and active else None,
+        "segments_indexed": len(segments),
+        "index_build_s": index_seconds,
+        "seek_us": seek_us,
+    }
+    if args.json:
+        print(json.dumps(result))
+        return 0
+    for cam, rate in sorted(throughput.items()):
+        print(f"{cam}: {rate * 8 / 1e6:.2f} Mbit/s ({rate / 1024:.0f} KiB/s to disk)")
+    if result["cpu_percent_per_camera"] is not None:
+        print(f"MediaMTX CPU: {cpu_percent:.1f}% total, {result['cpu_percent_per_camera']:.1f}% per camera")
+    elif cpu_percent is not None:
+        print(f"MediaMTX CPU: {cpu_percent:.1f}% total (no camera wrote data during the window)")
+    else:
+        print("MediaMTX CPU: unavailable (pass --pid or --docker)")
+    print(f"index: {len(segments)} segments in {index_seconds * 1000:.1f} ms; seek: {seek_us or 0:.1f} µs avg")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
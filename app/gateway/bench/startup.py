@@ -0,0 +1,156 @@
+"""Gateway cold-start benchmark: time-to-first-``/healthz`` and baseline RSS.
+
+Starts the gateway ``--runs`` times, polls ``/healthz`` until it answers 200 and
+samples the server's RSS right after (and again after ``--settle`` seconds).
+A summary line is appended to ``--history`` (JSON lines) so numbers can be
+compared across releases.
+
+Usage::
+
+    # local process (run from app/gateway)
+    python bench/startup.py --runs 5
+
+    # the built container image
+    python bench/startup.py --runs 5 --docker baby-monitor-gateway:latest
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+GATEWAY_DIR = Path(__file__).resolve().parents[1]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_kib(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _docker_rss_kib(container: str) -> Optional[int]:
+    out = subprocess.run(
+        ["docker", "stats", "--no-stream", "--format", "{{.MemUsage}}", container],
+        capture_output=True, text=True, check=False,
+    ).stdout.strip()
+    if not out:
+        return None
+    value = out.split("/")[0].strip()
+    units = {"KiB": 1, "MiB": 1024, "GiB": 1024 * 1024, "kB": 1000 / 1024, "MB": 1e6 / 1024, "GB": 1e9 / 1024}
+    for unit, factor in units.items():
+        if value.endswith(unit):
+            return int(float(value[: -len(unit)]) * factor)
+    return None
+
+
+def _wait_healthy(url: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as resp:
+                if resp.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.005)
+    return False
+
+
+def run_once(args: argparse.Namespace) -> dict:
+    port = _free_port()
+    container = None
+    if args.docker:
+        container = f"gateway-bench-{os.getpid()}-{port}"
+        cmd = ["docker", "run", "--rm", "--name", container, "-p", f"127.0.0.1:{port}:8000", args.docker]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)]
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=GATEWAY_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        healthy = _wait_healthy(f"http://127.0.0.1:{port}/healthz", args.timeout)
+        ttfh = time.perf_counter() - start
+        if not healthy:
+            raise SystemExit(f"gateway did not answer /healthz within {args.timeout}s")
+        rss = _docker_rss_kib(container) if container else _rss_kib(proc.pid)
+        time.sleep(args.settle)
+        rss_settled = _docker_rss_kib(container) if container else _rss_kib(proc.pid)
+    finally:
+        if container:
+            subprocess.run(["docker", "stop", "-t", "1", container], capture_output=True, check=False)
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"time_to_healthz_s": ttfh, "rss_kib": rss, "rss_settled_kib": rss_settled}
+
+
+def _git_describe() -> str:
+    out = subprocess.run(
+        ["git", "describe", "--tags", "--always", "--dirty"],
+        cwd=GATEWAY_DIR, capture_output=True, text=True, check=False,
+    ).stdout.strip()
+    return out or "unknown"
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure gateway time-to-first-/healthz and RSS.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for /healthz per run")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait before the second RSS sample")
+    parser.add_argument("--docker", metavar="IMAGE", help="benchmark a container image instead of a local process")
+    parser.add_argument("--label", default=None, help="release label (default: git describe)")
+    parser.add_argument("--history", type=Path, default=GATEWAY_DIR / "bench" / "startup-history.jsonl")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args) for _ in range(max(1, args.runs))]
+    times = [r["time_to_healthz_s"] for r in runs]
+    rss = [r["rss_settled_kib"] for r in runs if r["rss_settled_kib"] is not None]
+    summary = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "label": args.label or _git_describe(),
+        "target": args.docker or "local",
+        "python": sys.version.split()[0],
+        "runs": len(runs),
+        "time_to_healthz_s": {
+            "min": min(times),
+            "median": statistics.median(times),
+            "max": max(times),
+        },
+        "rss_kib_median": statistics.median(rss) if rss else None,
+        "samples": runs,
+    }
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    with args.history.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps(summary) + "\n")
+
+    t = summary["time_to_healthz_s"]
+    print(
+        f"{summary['label']} [{summary['target']}] time-to-healthz median {t['median'] * 1000:.0f} ms "
+        f"(min {t['min'] * 1000:.0f}, max {t['max'] * 1000:.0f}); RSS median {summary['rss_kib_median']} KiB"
+    )
+    print(f"appended to {args.history}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
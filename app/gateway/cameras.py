@@ -0,0 +1,404 @@
+"""Camera registry: one validated list of cameras for every component.
+
+The registry is a TOML file (YAML also works if PyYAML is installed)::
+
+    [defaults]
+    username = "${TAPO_USERNAME}"
+    password = "${TAPO_PASSWORD}"
+    view_stream = 1   # main HD stream for people watching
+    ai_stream = 2     # cheap substream for analysis
+
+    [cameras.nursery]
+    host = "192.168.1.123"
+    label = "Nursery"
+    record = true
+
+``${VAR}`` in string values is expanded from the environment, so credentials
+can stay in ``.env``. Each camera may override anything from ``[defaults]``.
+Non-Tapo cameras can set ``url = "rtsp://...{stream}..."`` instead of ``host``.
+
+The gateway loads the registry once, serves it (without credentials) on
+``/cameras`` and mirrors it into MediaMTX paths through the MediaMTX API. The
+Tapo example tools read the same file (``--camera NAME``). When no file is
+configured, a single camera ``cam`` is built from the legacy ``TAPO_*``
+variables.
+
+Run ``python cameras.py check FILE`` to validate a file, or
+``python cameras.py mediamtx FILE`` to print a ``paths:`` block for a static
+``mediamtx.yml``.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib  # type: ignore[no-redef]
+
+ROLES = ("view", "ai")
+DEFAULT_PORT = 554
+AI_PATH_SUFFIX = "_ai"
+ENV_FILE = "CAMERAS_FILE"
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*$")
+_VAR_RE = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)\}")
+_TRUE = {"1", "true", "t", "yes", "y", "on"}
+_FALSE = {"0", "false", "f", "no", "n", "off"}
+
+
+class RegistryError(ValueError):
+    """The registry file is missing, unreadable or fails validation."""
+
+
+@dataclass(frozen=True)
+class Camera:
+    name: str
+    host: Optional[str] = None
+    port: int = DEFAULT_PORT
+    username: Optional[str] = None
+    password: Optional[str] = None
+    view_stream: int = 1
+    ai_stream: int = 2
+    url: Optional[str] = None
+    label: Optional[str] = None
+    record: bool = False
+    on_demand: bool = True
+
+    def stream(self, role: str) -> int:
+        if role not in ROLES:
+            raise ValueError(f"unknown stream role {role!r} (expected one of {', '.join(ROLES)})")
+        return self.ai_stream if role == "ai" else self.view_stream
+
+    def rtsp_url(self, stream: int) -> str:
+        if self.url:
+            return self.url.format(stream=stream)
+        # Credentials go in verbatim, as the Tapo scripts always did; FFmpeg's
+        # RTSP client does not reliably percent-decode them.
+        auth = ""
+        if self.username:
+            auth = self.username + (f":{self.password}" if self.password else "") + "@"
+        return f"rtsp://{auth}{self.host}:{self.port}/stream{stream}"
+
+    def safe_url(self, stream: int) -> str:
+        """The RTSP URL with credentials removed, for logs and APIs."""
+
+        parts = urlsplit(self.rtsp_url(stream))
+        netloc = parts.hostname or ""
+        if parts.port:
+            netloc = f"{netloc}:{parts.port}"
+        return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+    def path(self, role: str = "view") -> str:
+        """MediaMTX path name; the AI stream gets its own path when it differs."""
+
+        if role == "ai" and self.ai_stream != self.view_stream:
+            return self.name + AI_PATH_SUFFIX
+        return self.name
+
+    def mediamtx_paths(self) -> Dict[str, Dict[str, Any]]:
+        paths = {
+            self.path("view"): {
+                "source": self.rtsp_url(self.view_stream),
+                "sourceOnDemand": self.on_demand,
+                "record": self.record,
+            }
+        }
+        if self.path("ai") != self.path("view"):
+            paths[self.path("ai")] = {
+                "source": self.rtsp_url(self.ai_stream),
+                "sourceOnDemand": self.on_demand,
+                "record": False,
+            }
+        return paths
+
+    def public(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "label": self.label or self.name,
+            "record": self.record,
+            "view": {"stream": self.view_stream, "path": self.path("view"), "hls": f"/hls/{self.path('view')}/index.m3u8"},
+            "ai": {"stream": self.ai_stream, "path": self.path("ai")},
+        }
+
+
+_FIELDS = {f.name: f for f in fields(Camera)}
+_INT_FIELDS = {"port", "view_stream", "ai_stream"}
+_BOOL_FIELDS = {"record", "on_demand"}
+
+
+def _expand(value: str, env: Mapping[str, str], where: str, errors: List[str]) -> str:
+    def repl(match: "re.Match[str]") -> str:
+        var = match.group(1)
+        if var not in env:
+            errors.append(f"{where}: environment variable {var} is not set")
+            return ""
+        return env[var]
+
+    return _VAR_RE.sub(repl, value)
+
+
+def _coerce(key: str, value: Any, where: str, errors: List[str]) -> Any:
+    if value is None:
+        return None
+    if key in _INT_FIELDS:
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, int):
+            errors.append(f"{where}.{key}: expected an integer, got {value!r}")
+            return None
+        if key == "port" and not 0 < value < 65536:
+            errors.append(f"{where}.port: {value} is out of range")
+        if key != "port" and value < 1:
+            errors.append(f"{where}.{key}: stream numbers start at 1")
+        return value
+    if key in _BOOL_FIELDS:
+        if isinstance(value, str) and value.strip().lower() in _TRUE | _FALSE:
+            return value.strip().lower() in _TRUE
+        if not isinstance(value, bool):
+            errors.append(f"{where}.{key}: expected true/false, got {value!r}")
+            return None
+        return value
+    if not isinstance(value, str):
+        errors.append(f"{where}.{key}: expected a string, got {value!r}")
+        return None
+    return value
+
+
+def _section(raw: Any, where: str, env: Mapping[str, str], errors: List[str]) -> Dict[str, Any]:
+    if not isinstance(raw, dict):
+        errors.append(f"{where}: expected a table")
+        return {}
+    values: Dict[str, Any] = {}
+    for key, value in raw.items():
+        if key not in _FIELDS or key == "name":
+            errors.append(f"{where}: unknown key {key!r}")
+            continue
+        if isinstance(value, str):
+            value = _expand(value, env, f"{where}.{key}", errors).strip() or None
+        values[key] = _coerce(key, value, where, errors)
+    return values
+
+
+class CameraRegistry:
+    def __init__(self, cameras: Mapping[str, Camera], source: Optional[Path] = None):
+        self.cameras: Dict[str, Camera] = dict(cameras)
+        self.source = source
+
+    def __iter__(self):
+        return iter(self.cameras.values())
+
+    def __len__(self) -> int:
+        return len(self.cameras)
+
+    def names(self) -> List[str]:
+        return list(self.cameras)
+
+    def get(self, name: Optional[str] = None) -> Camera:
+        """Look up a camera; without a name, the first one in the file."""
+
+        if not self.cameras:
+            where = self.source or "the environment"
+            raise RegistryError(f"no cameras are defined in {where}")
+        if name is None:
+            return next(iter(self.cameras.values()))
+        try:
+            return self.cameras[name]
+        except KeyError:
+            raise RegistryError(f"unknown camera {name!r} (known: {', '.join(self.cameras)})") from None
+
+    def mediamtx_paths(self) -> Dict[str, Dict[str, Any]]:
+        paths: Dict[str, Dict[str, Any]] = {}
+        for camera in self:
+            paths.update(camera.mediamtx_paths())
+        return paths
+
+    def diff(self, other: "CameraRegistry") -> Tuple[List[str], List[str], List[str]]:
+        """Camera names ``(added, changed, removed)`` going from ``self`` to ``other``."""
+
+        added = [n for n in other.cameras if n not in self.cameras]
+        removed = [n for n in self.cameras if n not in other.cameras]
+        changed = [n for n in other.cameras if n in self.cameras and other.cameras[n] != self.cameras[n]]
+        return added, changed, removed
+
+    @classmethod
+    def from_mapping(
+        cls, data: Any, source: Optional[Path] = None, env: Optional[Mapping[str, str]] = None
+    ) -> "CameraRegistry":
+        env = os.environ if env is None else env
+        errors: List[str] = []
+        if not isinstance(data, dict):
+            raise RegistryError(f"{source or 'registry'}: expected a table at the top level")
+        unknown = set(data) - {"defaults", "cameras"}
+        if unknown:
+            errors.append(f"unknown top-level keys: {', '.join(sorted(unknown))}")
+        defaults = _section(data.get("defaults", {}), "defaults", env, errors)
+        raw_cameras = data.get("cameras", {})
+        if not isinstance(raw_cameras, dict):
+            errors.append("cameras: expected a table of cameras")
+            raw_cameras = {}
+
+        cameras: Dict[str, Camera] = {}
+        for name, raw in raw_cameras.items():
+            where = f"cameras.{name}"
+            if not _NAME_RE.match(name):
+                errors.append(f"{where}: names may only use letters, digits, '-' and '_'")
+                continue
+            if name.endswith(AI_PATH_SUFFIX):
+                errors.append(f"{where}: names ending in {AI_PATH_SUFFIX!r} are reserved for AI stream paths")
+                continue
+            values = {**defaults, **_section(raw, where, env, errors)}
+            if not values.get("host") and not values.get("url"):
+                errors.append(f"{where}: set either host or url")
+                continue
+            if values.get("url") and "{stream}" not in values["url"]:
+                # A fixed URL cannot serve two different streams.
+                values["ai_stream"] = values["view_stream"] = values.get("view_stream") or 1
+            cameras[name] = Camera(name=name, **{k: v for k, v in values.items() if v is not None})
+        if errors:
+            raise RegistryError(f"{source or 'registry'}: " + "; ".join(errors))
+        return cls(cameras, source)
+
+    @classmethod
+    def load(cls, path: "os.PathLike[str] | str", env: Optional[Mapping[str, str]] = None) -> "CameraRegistry":
+        path = Path(path)
+        try:
+            raw = path.read_bytes()
+        except OSError as exc:
+            raise RegistryError(f"cannot read camera registry {path}: {exc.strerror or exc}") from exc
+        try:
+            if path.suffix in (".yml", ".yaml"):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RegistryError(f"{path}: YAML registries need PyYAML; use TOML instead") from None
+                data = yaml.safe_load(raw) or {}
+            else:
+                data = tomllib.loads(raw.decode("utf-8"))
+        except RegistryError:
+            raise
+        except Exception as exc:  # tomllib.TOMLDecodeError, yaml.YAMLError, UnicodeDecodeError
+            raise RegistryError(f"{path}: {exc}") from exc
+        return cls.from_mapping(data, path, env)
+
+    @classmethod
+    def from_env(cls, env: Optional[Mapping[str, str]] = None, prefix: str = "TAPO_") -> "CameraRegistry":
+        """A one-camera registry (``cam``) from the legacy ``TAPO_*`` variables."""
+
+        env = os.environ if env is None else env
+        raw = {
+            key: (env.get(prefix + var) or "").strip()
+            for key, var in (
+                ("host", "HOST"),
+                ("username", "USERNAME"),
+                ("password", "PASSWORD"),
+                ("port", "PORT"),
+                ("view_stream", "STREAM"),
+                ("ai_stream", "AI_STREAM"),
+            )
+        }
+        if not raw["host"]:
+            return cls({})
+        return cls.from_mapping({"cameras": {"cam": {k: v for k, v in raw.items() if v}}}, env={})
+
+
+def resolve(path: "os.PathLike[str] | str | None" = None, env: Optional[Mapping[str, str]] = None) -> CameraRegistry:
+    """Load ``path`` (or ``$CAMERAS_FILE``), falling back to the ``TAPO_*`` variables."""
+
+    env = os.environ if env is None else env
+    path = path or (env.get(ENV_FILE) or "").strip() or None
+    if path:
+        return CameraRegistry.load(path, env)
+    return CameraRegistry.from_env(env)
+
+
+_NOT_POLLED = object()
+
+
+class RegistryWatcher:
+    """Reloads a registry file when it changes; a bad edit keeps the old registry.
+
+    ``poll()`` is cheap (one ``stat``) and returns the ``(added, changed,
+    removed)`` diff when a reload happened, so callers only touch the cameras
+    that actually changed and leave running streams alone.
+    """
+
+    def __init__(self, path: "os.PathLike[str] | str", env: Optional[Mapping[str, str]] = None):
+        self.path = Path(path)
+        self.env = env
+        self.registry = CameraRegistry({}, self.path)
+        self.error: Optional[str] = None
+        # Distinct from None (= file missing), so a file that is absent at
+        # startup is still reported on the first poll.
+        self._stamp: object = _NOT_POLLED
+
+    def _current_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def poll(self) -> Optional[Tuple[List[str], List[str], List[str]]]:
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        if stamp is None:
+            new = CameraRegistry({}, self.path)
+            self.error = f"{self.path} does not exist"
+        else:
+            try:
+                new = CameraRegistry.load(self.path, self.env)
+            except RegistryError as exc:
+                self.error = str(exc)
+                return None
+            self.error = None
+        diff = self.registry.diff(new)
+        self.registry = new
+        return diff if any(diff) else None
+
+
+def _yaml_scalar(value: Any) -> str:
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def render_mediamtx_paths(registry: CameraRegistry) -> str:
+    lines = ["paths:"]
+    for name, conf in registry.mediamtx_paths().items():
+        lines.append(f"  {name}:")
+        lines.extend(f"    {key}: {_yaml_scalar(value)}" for key, value in conf.items())
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate the camera registry or render MediaMTX paths from it.")
+    parser.add_argument("command", choices=("check", "mediamtx"))
+    parser.add_argument("file", nargs="?", help=f"registry file (default: ${ENV_FILE})")
+    args = parser.parse_args(argv)
+    try:
+        registry = resolve(args.file)
+    except RegistryError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    if args.command == "check":
+        for camera in registry:
+            print(f"{camera.name}: view {camera.safe_url(camera.view_stream)}, ai {camera.safe_url(camera.ai_stream)}")
+        print(f"{len(registry)} camera(s) OK")
+    else:
+        sys.stdout.write(render_mediamtx_paths(registry))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""Lightweight per-stage instrumentation for the gateway hot path.
+
+Each request gets a ``RequestTimer`` that records named stages (upload read,
+base64, upstream connect, Gemini inference, JSON parsing, ...).  On the way out
+the timings are:
+
+- sent back to the client as a ``Server-Timing`` header,
+- folded into Prometheus-style histograms exposed at ``/metrics``,
+- optionally exported as OpenTelemetry-style spans (JSON lines file or an
+  OTLP/HTTP JSON collector).
+
+Everything is switchable off with ``GATEWAY_INSTRUMENTATION=0``; the time spent
+in the bookkeeping itself is tracked as ``gateway_instrumentation_overhead_seconds_total``
+so the cost stays measurable.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+def env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "t", "yes", "y", "on"}
+
+
+def escape_label(value: Any) -> str:
+    """Escape a Prometheus label value (backslash, double quote and newline)."""
+
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Seconds; tuned for a range from sub-millisecond stages up to slow Gemini calls.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """Cumulative histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # bucket counts..., +Inf count, sum
+                series = [0.0] * (len(self.buckets) + 2)
+                self._series[labels] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            base = ",".join(f'{k}="{escape_label(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {int(count)}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {int(series[-2])}')
+            lines.append(f"{self.name}_count{{{base}}} {int(series[-2])}")
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter", f"{self.name} {self.value:.6f}"]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.register(
+    Histogram("gateway_stage_duration_seconds", "Time spent in each request stage.", ("route", "stage"))
+)
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram("gateway_request_duration_seconds", "End-to-end request time.", ("route", "method", "status"))
+)
+OVERHEAD_SECONDS = REGISTRY.register(
+    Counter("gateway_instrumentation_overhead_seconds_total", "Time spent recording instrumentation itself.")
+)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+
+    @property
+    def duration(self) -> float:
+        return max(0, self.end_ns - self.start_ns) / 1e9
+
+
+class RequestTimer:
+    """Collects stage timings and spans for a single request."""
+
+    enabled = True
+
+    def __init__(self, route: str, method: str = "GET"):
+        self.route = route
+        self.trace_id = secrets.token_hex(16)
+        self.root = Span(f"{method} {route}", None, {"http.method": method, "http.route": route})
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def stage(self, name: str, **attributes: Any) -> Iterator[Span]:
+        span = Span(name, self.root.span_id, attributes)
+        try:
+            yield span
+        finally:
+            span.end()
+            self.spans.append(span)
+
+    def record(self, name: str, start_ns: int, end_ns: int, **attributes: Any) -> None:
+        """Add a stage measured elsewhere (e.g. from an httpx trace callback)."""
+
+        span = Span(name, self.root.span_id, attributes)
+        span.start_ns, span.end_ns = start_ns, end_ns
+        self.spans.append(span)
+
+    def server_timing(self) -> str:
+        entries = [f"{s.name};dur={s.duration * 1000:.2f}" for s in self.spans]
+        entries.append(f"total;dur={self.root.duration * 1000:.2f}")
+        return ", ".join(entries)
+
+    def finish(self, status: int) -> None:
+        self.root.end()
+        self.root.attributes["http.status_code"] = status
+        for span in self.spans:
+            STAGE_SECONDS.observe((self.route, span.name), span.duration)
+        REQUEST_SECONDS.observe((self.route, str(self.root.attributes["http.method"]), str(status)), self.root.duration)
+
+
+class NullTimer:
+    """Drop-in ``RequestTimer`` used when instrumentation is switched off."""
+
+    enabled = False
+
+    @contextmanager
+    def stage(self, name: str, **attributes: Any) -> Iterator[None]:
+        yield None
+
+    def record(self, name: str, start_ns: int, end_ns: int, **attributes: Any) -> None:
+        return None
+
+
+NULL_TIMER = NullTimer()
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            out.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            out.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            out.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            out.append({"key": key, "value": {"stringValue": str(value)}})
+    return out
+
+
+def to_otlp(timer: RequestTimer, service_name: str) -> Dict[str, Any]:
+    spans = []
+    for span in [timer.root, *timer.spans]:
+        spans.append(
+            {
+                "traceId": timer.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id or "",
+                "name": span.name,
+                "kind": 2 if span.parent_id is None else 1,  # SERVER / INTERNAL
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": _otlp_attributes(span.attributes),
+            }
+        )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+                "scopeSpans": [{"scope": {"name": "gateway.instrumentation"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class FileSpanExporter:
+    """Appends one OTLP/JSON document per request to a local file.
+
+    The write happens on a worker thread so a slow disk never blocks the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _append(self, line: str) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(line)
+
+    async def export(self, payload: Dict[str, Any]) -> None:
+        line = json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n"
+        await asyncio.to_thread(self._append, line)
+
+    async def aclose(self) -> None:
+        return None
+
+
+class OTLPHttpExporter:
+    """Posts OTLP/JSON to a local collector (``{endpoint}/v1/traces``)."""
+
+    def __init__(self, endpoint: str):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self._client: Any = None
+
+    async def export(self, payload: Dict[str, Any]) -> None:
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(2.0))
+        try:
+            await self._client.post(self.url, json=payload)
+        except httpx.HTTPError:
+            # A missing collector must never break the request path.
+            pass
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+
+
+def exporter_from_env() -> Optional[Any]:
+    endpoint = os.getenv("GATEWAY_OTLP_ENDPOINT", "").strip()
+    if endpoint:
+        return OTLPHttpExporter(endpoint)
+    path = os.getenv("GATEWAY_TRACE_FILE", "").strip()
+    if path:
+        return FileSpanExporter(path)
+    return None
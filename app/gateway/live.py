@@ -0,0 +1,443 @@
+"""Shared Gemini Live sessions per camera, pushed to browsers.
+
+``example/gemini-realtime-streaming/stream_video.py`` runs one Live session per
+terminal. Here the gateway hosts at most one session per camera and fans its
+text out to every subscriber, so ten open tabs cost the same as one:
+
+- the first subscriber starts the session: a reader thread pulls the camera's
+  AI stream (normally the MediaMTX ``<name>_ai`` path, so the camera itself
+  still sees a single RTSP client) and the newest frame is sent every
+  ``1 / fps`` seconds, JPEG-encoded and downscaled as in ``stream_video.py``;
+- model output is published as events (``status``, ``text`` chunks, a
+  ``turn`` when the model finishes, ``usage``, ``error``); new subscribers get
+  the last few turns replayed;
+- when the last subscriber leaves, the session keeps running for
+  ``idle_timeout`` seconds (a page reload should not cost a reconnect) and is
+  then closed together with the camera stream;
+- a dropped Live connection (server-side session limits, network) is
+  reconnected while anyone is still watching.
+
+google-genai and OpenCV are optional: they are imported on first use, and the
+bridge reports itself unavailable when they are missing.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import instrumentation
+import quality
+
+DEFAULT_MODEL = "gemini-2.0-flash-live-preview-04-09"
+DEFAULT_PROMPT = "赤ちゃんの安全や快適さに関わるポイントをリアルタイムで教えて"
+DEFAULT_SYSTEM_INSTRUCTION = "赤ちゃんモニターの安全管理アシスタントとして、危険や異常を素早く指摘して。"
+
+_genai: Any = None
+_types: Any = None
+_cv2: Any = None
+
+FRAMES_SENT = instrumentation.REGISTRY.register(
+    instrumentation.Counter("gateway_live_frames_sent_total", "Frames sent to Gemini Live sessions")
+)
+BYTES_SENT = instrumentation.REGISTRY.register(
+    instrumentation.Counter("gateway_live_frame_bytes_total", "JPEG bytes sent to Gemini Live sessions")
+)
+
+
+def available() -> bool:
+    global _genai, _types, _cv2
+    if _genai is not None:
+        return True
+    try:
+        import cv2
+        from google import genai
+        from google.genai import types
+    except ImportError:
+        return False
+    _genai, _types, _cv2 = genai, types, cv2
+    return True
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+@dataclass(frozen=True)
+class LiveSettings:
+    model: str = DEFAULT_MODEL
+    prompt: str = DEFAULT_PROMPT
+    system_instruction: str = DEFAULT_SYSTEM_INSTRUCTION
+    fps: float = 1.0
+    max_width: int = 640
+    jpeg_quality: int = 80
+    temperature: float = 0.4
+    top_p: float = 0.8
+    max_output_tokens: int = 512
+    idle_timeout: float = 60.0
+    reconnect_delay: float = 5.0
+    history: int = 20
+    quality_gate: bool = False
+    min_sharpness: float = quality.DEFAULT_MIN_SHARPNESS
+    max_defer: int = 5
+
+
+def connect_config(settings: LiveSettings) -> Any:
+    """The ``LiveConnectConfig`` for ``settings``; ``stream_video.py`` builds its session with this too."""
+
+    if not available():
+        raise RuntimeError("the Live bridge needs google-genai and opencv-python-headless")
+    return _types.LiveConnectConfig(
+        response_modalities=["TEXT"],
+        system_instruction=_types.Content(
+            parts=[_types.Part(text=settings.system_instruction or "映像から重要ポイントを即座に伝えてね。")]
+        ),
+        generation_config=_types.GenerationConfig(
+            temperature=settings.temperature,
+            top_p=settings.top_p,
+            max_output_tokens=settings.max_output_tokens,
+        ),
+    )
+
+
+async def receive_events(session: Any) -> AsyncIterator[Dict[str, Any]]:
+    """Turn a Live session's messages into ``ready``/``text``/``turn``/``usage`` events.
+
+    Raises ``ConnectionError`` when the server closes the connection.
+    """
+
+    turn: List[str] = []
+    # ``receive()`` ends after each completed turn, so keep asking for the next one.
+    while True:
+        received = False
+        async for message in session.receive():
+            received = True
+            if message.setup_complete:
+                yield {"type": "ready"}
+                continue
+
+            content = message.server_content
+            if content and content.model_turn:
+                for part in content.model_turn.parts or []:
+                    if part.text:
+                        turn.append(part.text)
+                        yield {"type": "text", "text": part.text}
+            if content and content.turn_complete and turn:
+                yield {"type": "turn", "text": "".join(turn).strip()}
+                turn = []
+
+            if message.usage_metadata:
+                usage = message.usage_metadata
+                yield {
+                    "type": "usage",
+                    "prompt_tokens": usage.prompt_token_count or 0,
+                    "response_tokens": usage.candidates_token_count or 0,
+                }
+        if not received:
+            raise ConnectionError("the Live connection closed")
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    data = {k: v for k, v in event.items() if k != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class FrameGrabber:
+    """Reads an RTSP stream on a thread and keeps only the newest frame.
+
+    Reading continuously keeps FFmpeg's buffer drained, so the frame sent at
+    1 fps is the current one rather than one that queued up seconds ago. The
+    stream is reopened after ``reconnect_delay`` when it drops.
+    """
+
+    def __init__(self, url: str, reconnect_delay: float = 5.0):
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.error: Optional[str] = None
+        self._frame: Any = None
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-grabber", daemon=True)
+
+    def start(self) -> "FrameGrabber":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            cap = _cv2.VideoCapture(self.url)
+            if not cap.isOpened():
+                self.error = "could not open the camera stream"
+            while not self._stop.is_set() and cap.isOpened():
+                ok, frame = cap.read()
+                if not ok:
+                    self.error = "the camera stream ended"
+                    break
+                with self._lock:
+                    self._frame = frame
+                    self._seq += 1
+                self.error = None
+            cap.release()
+            self._stop.wait(self.reconnect_delay)
+
+    def latest(self) -> Tuple[int, Any]:
+        with self._lock:
+            return self._seq, self._frame
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+
+
+def _encode(frame: Any, max_width: int, jpeg_quality: int) -> Optional[bytes]:
+    h, w = frame.shape[:2]
+    if max_width and w > max_width:
+        frame = _cv2.resize(frame, (max_width, max(1, round(h * max_width / w))), interpolation=_cv2.INTER_AREA)
+    ok, buf = _cv2.imencode(".jpg", frame, [int(_cv2.IMWRITE_JPEG_QUALITY), jpeg_quality])
+    return buf.tobytes() if ok else None
+
+
+class LiveSession:
+    """One Gemini Live session for one camera, shared by all of its subscribers."""
+
+    def __init__(
+        self,
+        camera: str,
+        source: Callable[[], Optional[str]],
+        settings: LiveSettings,
+        api_key: str,
+        on_closed: Callable[["LiveSession"], None],
+    ):
+        self.camera = camera
+        self.source = source
+        self.settings = settings
+        self.api_key = api_key
+        self.on_closed = on_closed
+        self.state = "idle"
+        self.closed = False
+        self.started_at: Optional[str] = None
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.bytes_sent = 0
+        self.turns = 0
+        self.connects = 0
+        self.last_error: Optional[str] = None
+        self._subscribers: Set["asyncio.Queue[Dict[str, Any]]"] = set()
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=settings.history)
+        self._idle_since = time.monotonic()
+        self._restart = False
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def viewers(self) -> int:
+        return len(self._subscribers)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "camera": self.camera,
+            "state": self.state,
+            "viewers": self.viewers,
+            "started_at": self.started_at,
+            "connects": self.connects,
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "bytes_sent": self.bytes_sent,
+            "turns": self.turns,
+            "last_error": self.last_error,
+        }
+
+    # --- subscribers ------------------------------------------------------
+
+    def subscribe(self) -> "asyncio.Queue[Dict[str, Any]]":
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=100)
+        for event in self._history:
+            queue.put_nowait(event)
+        self._subscribers.add(queue)
+        if self._task is None:
+            self.started_at = _now()
+            self._task = asyncio.create_task(self._run())
+        self._publish({"type": "status", "state": self.state, "viewers": self.viewers})
+        return queue
+
+    def unsubscribe(self, queue: "asyncio.Queue[Dict[str, Any]]") -> None:
+        self._subscribers.discard(queue)
+        if not self._subscribers:
+            self._idle_since = time.monotonic()
+        self._publish({"type": "status", "state": self.state, "viewers": self.viewers})
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        for queue in self._subscribers:
+            if queue.full():
+                # A stalled browser loses its oldest events rather than
+                # holding up everyone else.
+                with contextlib.suppress(asyncio.QueueEmpty):
+                    queue.get_nowait()
+            queue.put_nowait(event)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self._publish({"type": "status", "state": state, "viewers": self.viewers})
+
+    def _error(self, message: str) -> None:
+        self.last_error = message
+        self._publish({"type": "error", "error": message})
+
+    def _should_close(self) -> bool:
+        if self._subscribers or time.monotonic() - self._idle_since < self.settings.idle_timeout:
+            return False
+        # Decided synchronously, so a subscriber arriving later gets a new session.
+        self.closed = True
+        return True
+
+    def restart(self) -> None:
+        """Reconnect with a freshly resolved source (the camera was edited)."""
+
+        self._restart = True
+
+    # --- session ----------------------------------------------------------
+
+    async def _run(self) -> None:
+        try:
+            while not self._should_close():
+                url = self.source()
+                if url is None:
+                    self._error(f"unknown camera {self.camera!r}")
+                    self.closed = True
+                    break
+                self._set_state("connecting")
+                try:
+                    await self._stream(url)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    self._error(f"live session failed: {exc}")
+                if self._restart:
+                    self._restart = False
+                    continue
+                if self._should_close():
+                    break
+                self._set_state("reconnecting")
+                await asyncio.sleep(self.settings.reconnect_delay)
+        finally:
+            self.closed = True
+            self._set_state("stopped")
+            self.on_closed(self)
+
+    async def _stream(self, url: str) -> None:
+        grabber = FrameGrabber(url, self.settings.reconnect_delay).start()
+        try:
+            client = _genai.Client(api_key=self.api_key, http_options={"api_version": "v1alpha"})
+            async with client.aio.live.connect(model=self.settings.model, config=connect_config(self.settings)) as session:
+                self.connects += 1
+                receiver = asyncio.create_task(self._receive_loop(session))
+                try:
+                    if self.settings.prompt:
+                        await session.send_realtime_input(text=self.settings.prompt)
+                    await self._send_frames(session, grabber, receiver)
+                finally:
+                    receiver.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await receiver
+        finally:
+            await asyncio.to_thread(grabber.stop)
+
+    async def _send_frames(self, session: Any, grabber: FrameGrabber, receiver: "asyncio.Task[None]") -> None:
+        interval = 1.0 / self.settings.fps if self.settings.fps > 0 else 1.0
+        last_seq = 0
+        deferred = 0
+        # Best (score, frame) among the frames held back since the last send.
+        held: Optional[Tuple[float, Any]] = None
+        scorer = None
+        if self.settings.quality_gate and quality.available():
+            scorer = quality.FrameQualityScorer(min_sharpness=self.settings.min_sharpness)
+        reported: Optional[str] = None
+        while not self._restart and not self._should_close():
+            if receiver.done():
+                receiver.result()  # re-raise what ended the connection
+                return
+            if grabber.error != reported:
+                reported = grabber.error
+                if reported:
+                    self._error(reported)
+            seq, frame = grabber.latest()
+            if seq != last_seq and frame is not None:
+                last_seq = seq
+                if scorer is not None:
+                    # Score the decoded frame itself; the grabber hands out a
+                    # fresh array per read, so holding on to it is safe.
+                    score = await asyncio.to_thread(scorer.score, frame)
+                    if not score.ok:
+                        if held is None or score.score > held[0]:
+                            held = (score.score, frame)
+                        deferred += 1
+                        if deferred <= self.settings.max_defer:
+                            self.frames_skipped += 1
+                            await asyncio.sleep(interval)
+                            continue
+                        # Nothing usable for a while: send the best of the bad ones.
+                        frame = held[1]
+                held, deferred = None, 0
+                encoded = await asyncio.to_thread(
+                    _encode, frame, self.settings.max_width, self.settings.jpeg_quality
+                )
+                if encoded is not None:
+                    await session.send_realtime_input(video=_types.Blob(data=encoded, mime_type="image/jpeg"))
+                    self.frames_sent += 1
+                    self.bytes_sent += len(encoded)
+                    FRAMES_SENT.inc()
+                    BYTES_SENT.inc(len(encoded))
+            await asyncio.sleep(interval)
+
+    async def _receive_loop(self, session: Any) -> None:
+        async for event in receive_events(session):
+            if event["type"] == "ready":
+                self._set_state("live")
+                continue
+            if event["type"] == "turn":
+                event["time"] = _now()
+                self.turns += 1
+                self._history.append(event)
+            self._publish(event)
+
+
+class LiveHub:
+    """Owns the per-camera sessions; ``source_for(camera)`` resolves RTSP URLs."""
+
+    def __init__(self, source_for: Callable[[str], Optional[str]], settings: LiveSettings, api_key: str):
+        self.source_for = source_for
+        self.settings = settings
+        self.api_key = api_key
+        self.sessions: Dict[str, LiveSession] = {}
+
+    def subscribe(self, camera: str) -> Tuple[LiveSession, "asyncio.Queue[Dict[str, Any]]"]:
+        session = self.sessions.get(camera)
+        if session is None or session.closed:
+            session = LiveSession(camera, lambda: self.source_for(camera), self.settings, self.api_key, self._closed)
+            self.sessions[camera] = session
+        return session, session.subscribe()
+
+    def _closed(self, session: LiveSession) -> None:
+        if self.sessions.get(session.camera) is session:
+            del self.sessions[session.camera]
+
+    def restart(self, cameras: List[str]) -> None:
+        for name in cameras:
+            session = self.sessions.get(name)
+            if session is not None:
+                session.restart()
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [session.status() for session in self.sessions.values()]
+
+    async def aclose(self) -> None:
+        tasks = [s._task for s in self.sessions.values() if s._task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
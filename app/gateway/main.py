@@ -1,22 +1,105 @@
 from __future__ import annotations
 
+import profiling
+
+# Start before the heavy imports below so their cost shows up in the profile.
+profiling.start_from_env()
+
+import asyncio
 import base64
+import hmac
 import os
-from typing import Optional
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional, Set
 
-import httpx
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, UploadFile, Form, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+
+import cameras
+import instrumentation
+import live
+import mediamtx
+import quality
+import recordings
+
+
+def _load_dotenv() -> None:
+    # In the container settings come from compose's env_file, so python-dotenv is
+    # only needed (and only imported) when a local .env is actually present.
+    # app/.env (next to docker-compose.yml) is the one the README has people create.
+    here = Path(__file__).resolve().parent
+    for candidate in (here / ".env", here.parent / ".env", Path.cwd() / ".env"):
+        if candidate.exists():
+            from dotenv import load_dotenv
+
+            load_dotenv(candidate, override=False)
 
 
-load_dotenv()
+_load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip()
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest").strip() or "gemini-1.5-flash-latest"
+# Overridable so benchmarks can point the gateway at a local stub server.
+GEMINI_API_BASE = (os.getenv("GEMINI_API_BASE", "").strip() or "https://generativelanguage.googleapis.com").rstrip("/")
+
+INSTRUMENTATION_ENABLED = instrumentation.env_flag("GATEWAY_INSTRUMENTATION", True)
+SERVICE_NAME = os.getenv("GATEWAY_SERVICE_NAME", "gemini-gateway").strip() or "gemini-gateway"
+ADMIN_TOKEN = os.getenv("GATEWAY_ADMIN_TOKEN", "").strip()
+RECORDINGS_TOKEN = os.getenv("GATEWAY_RECORDINGS_TOKEN", "").strip()
+LIVE_TOKEN = os.getenv("GATEWAY_LIVE_TOKEN", "").strip()
+RECORDINGS_DIR = Path(os.getenv("GATEWAY_RECORDINGS_DIR", "/recordings").strip() or "/recordings")
+RECORDINGS_MAX_BYTES = recordings.parse_size(os.getenv("GATEWAY_RECORDINGS_MAX_BYTES", "").strip() or "0")
+RECORDINGS_EVICT_INTERVAL = float(os.getenv("GATEWAY_RECORDINGS_EVICT_INTERVAL", "60").strip() or "60")
+QUALITY_GATE = instrumentation.env_flag("GATEWAY_QUALITY_GATE", False)
+QUALITY_MIN_SHARPNESS = float(
+    os.getenv("GATEWAY_QUALITY_MIN_SHARPNESS", "").strip() or quality.DEFAULT_MIN_SHARPNESS
+)
+CAMERAS_FILE = (os.getenv("GATEWAY_CAMERAS_FILE") or os.getenv(cameras.ENV_FILE) or "").strip()
+CAMERAS_RELOAD_INTERVAL = float(os.getenv("GATEWAY_CAMERAS_RELOAD_INTERVAL", "5").strip() or "5")
+MEDIAMTX_API = os.getenv("GATEWAY_MEDIAMTX_API", "").strip()
+# Live sessions read the camera through MediaMTX (rtsp://mediamtx:8554/<path>) when
+# set; otherwise straight from the camera URL in the registry.
+LIVE_RTSP_BASE = os.getenv("GATEWAY_LIVE_RTSP_BASE", "").strip().rstrip("/")
+# Without a registry, only the static path from mediamtx.yml is available.
+LIVE_DEFAULT_PATH = os.getenv("STREAM_PATH", "cam").strip() or "cam"
+LIVE_SETTINGS = live.LiveSettings(
+    model=os.getenv("GATEWAY_LIVE_MODEL", "").strip() or live.DEFAULT_MODEL,
+    prompt=os.getenv("GATEWAY_LIVE_PROMPT", "").strip() or live.DEFAULT_PROMPT,
+    fps=float(os.getenv("GATEWAY_LIVE_FPS", "1").strip() or "1"),
+    idle_timeout=float(os.getenv("GATEWAY_LIVE_IDLE_TIMEOUT", "60").strip() or "60"),
+    quality_gate=QUALITY_GATE,
+    min_sharpness=QUALITY_MIN_SHARPNESS,
+)
+LIVE_KEEPALIVE = 15.0
 
 app = FastAPI(title="Gemini Gateway", version="0.1.0")
 
+_span_exporter: Any = instrumentation.exporter_from_env() if INSTRUMENTATION_ENABLED else None
+_export_tasks: Set["asyncio.Task[None]"] = set()
+_profile_lock = asyncio.Lock()
+_archive = recordings.RecordingArchive(RECORDINGS_DIR)
+_camera_watcher = cameras.RegistryWatcher(CAMERAS_FILE) if CAMERAS_FILE else None
+_path_sync = mediamtx.PathSync(MEDIAMTX_API) if MEDIAMTX_API else None
+
+
+def _live_source(name: str) -> Optional[str]:
+    registry = _camera_watcher.registry if _camera_watcher is not None else None
+    if registry is not None and name in registry.cameras:
+        camera = registry.cameras[name]
+        if LIVE_RTSP_BASE:
+            return f"{LIVE_RTSP_BASE}/{camera.path('ai')}"
+        return camera.rtsp_url(camera.stream("ai"))
+    if LIVE_RTSP_BASE and not registry and name == LIVE_DEFAULT_PATH:
+        return f"{LIVE_RTSP_BASE}/{name}"
+    return None
+
+
+_live_hub = live.LiveHub(_live_source, LIVE_SETTINGS, GEMINI_API_KEY)
+
 # Allow cross-origin from local dev hosts by default
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +110,348 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    if not INSTRUMENTATION_ENABLED or request.url.path == "/metrics":
+        request.state.timer = instrumentation.NULL_TIMER
+        return await call_next(request)
+
+    t0 = time.perf_counter()
+    timer = instrumentation.RequestTimer(request.url.path, request.method)
+    request.state.timer = timer
+    overhead = time.perf_counter() - t0
+
+    response = await call_next(request)
+
+    t0 = time.perf_counter()
+    # Label by route template, not raw path, to keep metric cardinality bounded.
+    route = request.scope.get("route")
+    timer.route = getattr(route, "path", None) or "unmatched"
+    timer.finish(response.status_code)
+    response.headers["Server-Timing"] = timer.server_timing()
+    if _span_exporter is not None:
+        # Export off the response path; a slow collector must not add latency.
+        task = asyncio.create_task(_span_exporter.export(instrumentation.to_otlp(timer, SERVICE_NAME)))
+        _export_tasks.add(task)
+        task.add_done_callback(_export_tasks.discard)
+    overhead += time.perf_counter() - t0
+    instrumentation.OVERHEAD_SECONDS.inc(overhead)
+    return response
+
+
+def _prewarm_imports() -> None:
+    # httpx is only needed by /analyze; importing it here keeps it off the
+    # time-to-first-/healthz path without making the first analysis pay for it.
+    import httpx  # noqa: F401
+
+    if QUALITY_GATE and not quality.available():
+        print("GATEWAY_QUALITY_GATE is set but OpenCV/NumPy are not installed; the gate is disabled")
+
+
+@app.on_event("startup")
+async def _start_prewarm() -> None:
+    threading.Thread(target=_prewarm_imports, name="gateway-prewarm", daemon=True).start()
+
+
+async def _evict_recordings_forever() -> None:
+    while True:
+        removed = await asyncio.to_thread(_archive.enforce_quota, RECORDINGS_MAX_BYTES)
+        if removed:
+            print(f"recordings: evicted {len(removed)} segment(s) to stay under {RECORDINGS_MAX_BYTES} bytes")
+        await asyncio.sleep(RECORDINGS_EVICT_INTERVAL)
+
+
+@app.on_event("startup")
+async def _start_recording_eviction() -> None:
+    if RECORDINGS_MAX_BYTES > 0:
+        app.state.eviction_task = asyncio.create_task(_evict_recordings_forever())
+
+
+async def _watch_cameras_forever(watcher: cameras.RegistryWatcher) -> None:
+    last_error: Optional[str] = None
+    while True:
+        diff = await asyncio.to_thread(watcher.poll)
+        if watcher.error != last_error:
+            last_error = watcher.error
+            if last_error:
+                print(f"cameras: keeping the previous registry: {last_error}")
+        if diff:
+            added, changed, removed = diff
+            print(f"cameras: reloaded {watcher.path} (added={added}, changed={changed}, removed={removed})")
+            _live_hub.restart(changed + removed)
+        if _path_sync is not None and _path_sync.pending(watcher.registry):
+            touched = await _path_sync.sync(watcher.registry)
+            if touched:
+                print(f"cameras: updated MediaMTX paths {touched}")
+        await asyncio.sleep(CAMERAS_RELOAD_INTERVAL)
+
+
+@app.on_event("startup")
+async def _start_camera_registry() -> None:
+    if _camera_watcher is not None:
+        app.state.camera_task = asyncio.create_task(_watch_cameras_forever(_camera_watcher))
+
+
+@app.on_event("shutdown")
+async def _close_exporter() -> None:
+    if _export_tasks:
+        await asyncio.gather(*_export_tasks, return_exceptions=True)
+    if _span_exporter is not None:
+        await _span_exporter.aclose()
+
+
+@app.on_event("shutdown")
+async def _close_path_sync() -> None:
+    if _path_sync is not None:
+        await _path_sync.aclose()
+
+
+@app.on_event("shutdown")
+async def _close_live_sessions() -> None:
+    await _live_hub.aclose()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(instrumentation.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cameras")
+async def list_cameras():
+    if _camera_watcher is None:
+        return {"cameras": [], "error": "no camera registry configured (GATEWAY_CAMERAS_FILE)"}
+    registry = _camera_watcher.registry
+    return {"cameras": [camera.public() for camera in registry], "error": _camera_watcher.error}
+
+
+@app.get("/live")
+async def list_live_sessions():
+    available = bool(GEMINI_API_KEY and LIVE_TOKEN) and live.available()
+    return {"available": available, "sessions": _live_hub.status()}
+
+
+@app.get("/live/{camera}/events")
+async def live_events(camera: str, request: Request):
+    """Server-sent events from the camera's shared Gemini Live session.
+
+    The session starts with the first subscriber and stops ``GATEWAY_LIVE_IDLE_TIMEOUT``
+    seconds after the last one disconnects. Requires ``GATEWAY_LIVE_TOKEN``.
+    """
+
+    _require_live(request)
+    if not GEMINI_API_KEY:
+        return {"error": "GEMINI_API_KEY is not configured in environment"}
+    if not live.available():
+        return {"error": "the Live bridge needs google-genai and OpenCV (build with WITH_LIVE=1)"}
+    if _live_source(camera) is None:
+        raise HTTPException(status_code=404, detail=f"unknown camera {camera!r}")
+
+    session, queue = _live_hub.subscribe(camera)
+
+    async def stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=LIVE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Keeps proxies (nginx proxy_read_timeout) from closing a quiet stream.
+                    yield ": keepalive\n\n"
+                    continue
+                yield live.format_sse(event)
+                if event["type"] == "status" and event["state"] == "stopped":
+                    break
+        finally:
+            session.unsubscribe(queue)
+
+    # X-Accel-Buffering: nginx would otherwise hold events back in its proxy buffer.
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _require_token(request: Request, token: str, what: str, *, allow_query: bool = False) -> None:
+    # Without a configured token the protected surface does not exist at all.
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("authorization", "")
+    if allow_query and not supplied and "token" in request.query_params:
+        supplied = f"Bearer {request.query_params['token']}"
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=401, detail=f"invalid {what} token")
+
+
+def _require_admin(request: Request) -> None:
+    _require_token(request, ADMIN_TOKEN, "admin")
+
+
+def _require_recordings(request: Request) -> None:
+    # Recordings are footage of the home; they are never served anonymously.
+    _require_token(request, RECORDINGS_TOKEN, "recordings")
+
+
+def _require_live(request: Request) -> None:
+    # Each stream can start a paid Gemini Live session. Browsers' EventSource
+    # cannot set headers, so the token may also come as ?token=.
+    _require_token(request, LIVE_TOKEN, "live", allow_query=True)
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _parse_timestamp(raw: str) -> float:
+    try:
+        return float(raw)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="t must be epoch seconds or ISO 8601") from None
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+@app.get("/recordings")
+async def list_recording_cameras(request: Request):
+    _require_recordings(request)
+    cameras = {}
+    for camera in await asyncio.to_thread(_archive.cameras):
+        segments = await asyncio.to_thread(_archive.segments, camera)
+        if not segments:
+            continue
+        cameras[camera] = {
+            "segments": len(segments),
+            "bytes": sum(s.size for s in segments),
+            "first": _iso(segments[0].start),
+            "last": _iso(segments[-1].start),
+        }
+    return {"cameras": cameras, "max_bytes": RECORDINGS_MAX_BYTES or None}
+
+
+@app.get("/recordings/{camera}")
+async def list_recordings(camera: str, request: Request):
+    _require_recordings(request)
+    segments = await asyncio.to_thread(_archive.segments, camera)
+    return {
+        "camera": camera,
+        "segments": [
+            {"name": s.name, "start": _iso(s.start), "bytes": s.size, "url": f"recordings/{camera}/{s.name}"}
+            for s in segments
+        ],
+    }
+
+
+@app.get("/recordings/{camera}/seek")
+async def seek_recording(camera: str, t: str, request: Request):
+    """Resolve a timestamp to the nearest preceding keyframe.
+
+    Playback needs the init section (``bytes=0-{init_end - 1}``) followed by
+    the media from ``offset`` onwards.
+    """
+
+    _require_recordings(request)
+    result = await asyncio.to_thread(_archive.seek, camera, _parse_timestamp(t))
+    if result is None:
+        raise HTTPException(status_code=404, detail="no recording covers that time")
+    segment = result.segment
+    return {
+        "camera": camera,
+        "segment": segment.name,
+        "segment_start": _iso(segment.start),
+        "keyframe_time": _iso(segment.start + result.keyframe_time),
+        "offset": result.offset,
+        "init_end": result.init_end,
+        "url": f"recordings/{camera}/{segment.name}",
+    }
+
+
+@app.get("/recordings/{camera}/{name}")
+async def get_recording(camera: str, name: str, request: Request):
+    _require_recordings(request)
+    # Only names that are in the index are served, which also rules out path traversal.
+    segment = await asyncio.to_thread(_archive.find, camera, name)
+    if segment is None:
+        raise HTTPException(status_code=404, detail="segment not found")
+    size = (await asyncio.to_thread(segment.path.stat)).st_size
+    headers = {"Accept-Ranges": "bytes", "Content-Type": "video/mp4"}
+    try:
+        byte_range = recordings.parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        (start, end), status = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    return StreamingResponse(
+        recordings.iter_file_range(segment.path, start, end),
+        status_code=status,
+        headers=headers,
+        media_type="video/mp4",
+    )
+
+
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(
+    request: Request,
+    mode: str = "sample",
+    seconds: float = 10.0,
+    interval: float = profiling.DEFAULT_INTERVAL,
+):
+    """Profile the live process for ``seconds`` and return the report as text.
+
+    ``sample`` returns collapsed stacks (flamegraph input), ``cprofile`` a pstats
+    table for the event loop thread, ``tracemalloc`` the top allocation deltas.
+    """
+
+    _require_admin(request)
+    if mode not in profiling.MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(profiling.MODES)}")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="a profiling session is already running")
+
+    seconds = min(max(seconds, 0.1), profiling.MAX_SECONDS)
+    async with _profile_lock:
+        session = profiling.new_session(mode, interval).start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            session.stop()
+        report = await asyncio.to_thread(profiling.render, session)
+
+    filename = f"gateway-{mode}-{int(time.time())}.{'collapsed' if mode == 'sample' else 'txt'}"
+    return PlainTextResponse(report, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+class _UpstreamTrace:
+    """httpx trace hook that splits the upstream call into connect vs. inference."""
+
+    def __init__(self, timer: Any):
+        self.timer = timer
+        self.connect_start: Optional[int] = None
+        self.connect_end: Optional[int] = None
+        self.request_start: Optional[int] = None
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        now = time.time_ns()
+        if event_name == "connection.connect_tcp.started":
+            self.connect_start = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            # TCP, then TLS when there is one (GEMINI_API_BASE may be plain HTTP).
+            self.connect_end = now
+        elif event_name.endswith("send_request_headers.started"):
+            if self.connect_start is not None and self.connect_end is not None:
+                self.timer.record("connect", self.connect_start, self.connect_end)
+                self.connect_start = None
+            self.request_start = now
+        elif event_name.endswith("receive_response_body.complete"):
+            if self.request_start is not None:
+                self.timer.record("gemini", self.request_start, now)
+
+
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
@@ -34,8 +459,10 @@ async def healthz():
 
 @app.post("/analyze")
 async def analyze_image(
+    request: Request,
     image: UploadFile = File(...),
     prompt: Optional[str] = Form(None),
+    force: bool = Form(False),
 ):
     if not GEMINI_API_KEY:
         return {"error": "GEMINI_API_KEY is not configured in environment"}
@@ -43,10 +470,22 @@ async def analyze_image(
     # Default prompt focuses on baby monitoring safety cues
     prompt = (prompt or "赤ちゃんの安全や快適さの観点で、気づいた点を日本語で簡潔に箇条書きしてください。＊テスト用なのでベイマックスやぬいぐるみを赤ちゃんと仮定して")[:2000]
 
-    content = await image.read()
-    b64 = base64.b64encode(content).decode("ascii")
+    timer = request.state.timer
+
+    with timer.stage("read"):
+        content = await image.read()
+
+    if QUALITY_GATE and not force and quality.available():
+        # Blurry / badly exposed frames (IR switch-over, exposure hunting) are
+        # answered locally instead of spending a Gemini call on them.
+        with timer.stage("quality"):
+            score = await asyncio.to_thread(quality.assess, content, min_sharpness=QUALITY_MIN_SHARPNESS)
+        if score is not None and not score.ok:
+            return {"model": GEMINI_MODEL, "skipped": "low_quality", "quality": score.as_dict(), "text": ""}
+    with timer.stage("encode", bytes=len(content)):
+        b64 = base64.b64encode(content).decode("ascii")
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
+    url = f"{GEMINI_API_BASE}/v1beta/models/{GEMINI_MODEL}:generateContent"
 
     body = {
         "contents": [
@@ -68,22 +507,27 @@ async def analyze_image(
     headers = {"Content-Type": "application/json"}
     params = {"key": GEMINI_API_KEY}
 
+    import httpx
+
+    extensions = {"trace": _UpstreamTrace(timer)} if timer.enabled else None
     async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
-        r = await client.post(url, headers=headers, params=params, json=body)
+        with timer.stage("upstream"):
+            r = await client.post(url, headers=headers, params=params, json=body, extensions=extensions)
         try:
             r.raise_for_status()
         except httpx.HTTPStatusError:
             return {"error": "gemini_api_error", "status": r.status_code, "body": r.text}
-        data = r.json()
-
-    # Try to extract plain text
-    text = ""
-    for cand in (data.get("candidates") or []):
-        content = cand.get("content") or {}
-        for part in (content.get("parts") or []):
-            t = part.get("text")
-            if isinstance(t, str):
-                text += t
+        with timer.stage("parse"):
+            data = r.json()
+
+            # Try to extract plain text
+            text = ""
+            for cand in (data.get("candidates") or []):
+                content = cand.get("content") or {}
+                for part in (content.get("parts") or []):
+                    t = part.get("text")
+                    if isinstance(t, str):
+                        text += t
 
     return {"model": GEMINI_MODEL, "text": text.strip(), "raw": data}
 
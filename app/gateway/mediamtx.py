@@ -0,0 +1,74 @@
+"""Mirror the camera registry into MediaMTX paths via its control API.
+
+Only paths whose configuration differs from what was last applied are sent,
+so editing one camera never restarts the others' streams. Paths that fail
+(MediaMTX not up yet, API unreachable) stay pending and are retried on the
+next ``sync``.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import cameras
+
+
+class PathSync:
+    def __init__(self, api_url: str, timeout: float = 5.0):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.applied: Dict[str, Dict[str, Any]] = {}
+        self._client: Any = None
+
+    def _http(self) -> Any:
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(base_url=self.api_url, timeout=self.timeout)
+        return self._client
+
+    async def _upsert(self, name: str, conf: Dict[str, Any]) -> None:
+        client = self._http()
+        resp = await client.patch(f"/v3/config/paths/patch/{name}", json=conf)
+        if resp.status_code >= 400:
+            # Not there yet (first sync, or MediaMTX restarted): create it.
+            resp = await client.post(f"/v3/config/paths/add/{name}", json=conf)
+        resp.raise_for_status()
+
+    async def _delete(self, name: str) -> None:
+        resp = await self._http().delete(f"/v3/config/paths/delete/{name}")
+        if resp.status_code != 404:
+            resp.raise_for_status()
+
+    def pending(self, registry: cameras.CameraRegistry) -> bool:
+        return registry.mediamtx_paths() != self.applied
+
+    async def sync(self, registry: cameras.CameraRegistry) -> List[str]:
+        """Apply the difference between ``registry`` and MediaMTX; returns the paths touched."""
+
+        import httpx
+
+        desired = registry.mediamtx_paths()
+        touched: List[str] = []
+        for name, conf in desired.items():
+            if self.applied.get(name) == conf:
+                continue
+            try:
+                await self._upsert(name, conf)
+            except httpx.HTTPError as exc:
+                print(f"cameras: could not apply MediaMTX path {name!r}: {exc}")
+                continue
+            self.applied[name] = conf
+            touched.append(name)
+        for name in [n for n in self.applied if n not in desired]:
+            try:
+                await self._delete(name)
+            except httpx.HTTPError as exc:
+                print(f"cameras: could not remove MediaMTX path {name!r}: {exc}")
+                continue
+            del self.applied[name]
+            touched.append(name)
+        return touched
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
@@ -0,0 +1,190 @@
+"""On-demand profiling of the live gateway process.
+
+Three modes, all stdlib-only so they work in the slim container:
+
+- ``sample``: a background thread samples every thread's stack via
+  ``sys._current_frames()`` and emits flamegraph-compatible collapsed stacks
+  (``frame;frame;frame count`` per line, ready for ``flamegraph.pl`` or speedscope).
+- ``cprofile``: deterministic ``cProfile`` of the event-loop thread, reported
+  as a ``pstats`` table sorted by cumulative time.
+- ``tracemalloc``: diff of two allocation snapshots, top allocation sites first.
+
+``start_from_env()`` lets ``main.py`` start a sampler before its own imports so
+import and warmup costs can be captured (``GATEWAY_PROFILE_STARTUP=<seconds>``).
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+MODES = ("sample", "cprofile", "tracemalloc")
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 120.0
+# Our own helper threads are just noise in the report.
+_PROFILER_THREADS = {"gateway-sampler", "gateway-startup-profile"}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """Samples Python stacks of all threads at a fixed interval."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = max(0.001, interval)
+        self.samples: Counter[str] = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name="gateway-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        names = {}
+        while not self._stop.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                thread_name = names.get(ident, f"thread-{ident}")
+                if thread_name in _PROFILER_THREADS:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(thread_name)
+                stack.reverse()
+                self.samples[";".join(stack)] += 1
+            self.sample_count += 1
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class CProfileSession:
+    """cProfile bound to the thread that calls ``start`` (the event loop)."""
+
+    def __init__(self) -> None:
+        self._profile = cProfile.Profile()
+
+    def start(self) -> "CProfileSession":
+        self._profile.enable()
+        return self
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def report(self, limit: int = 50) -> str:
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+class TracemallocSession:
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self._owns_tracing = False
+        self._before: Optional[tracemalloc.Snapshot] = None
+        self._after: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> "TracemallocSession":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._owns_tracing = True
+        self._before = tracemalloc.take_snapshot()
+        return self
+
+    def stop(self) -> None:
+        self._after = tracemalloc.take_snapshot()
+        if self._owns_tracing:
+            tracemalloc.stop()
+
+    def report(self, limit: int = 30) -> str:
+        assert self._before is not None and self._after is not None
+        stats = self._after.compare_to(self._before, "traceback")
+        lines = [f"# top {limit} allocation sites by size delta"]
+        for stat in stats[:limit]:
+            lines.append(
+                f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks), now {stat.size / 1024:.1f} KiB"
+            )
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+        return "\n".join(lines) + "\n"
+
+
+def new_session(mode: str, interval: float = DEFAULT_INTERVAL):
+    if mode == "sample":
+        return SamplingProfiler(interval)
+    if mode == "cprofile":
+        return CProfileSession()
+    if mode == "tracemalloc":
+        return TracemallocSession()
+    raise ValueError(f"unknown profiling mode: {mode!r} (expected one of {', '.join(MODES)})")
+
+
+def render(session) -> str:
+    if isinstance(session, SamplingProfiler):
+        return session.collapsed()
+    return session.report()
+
+
+def start_from_env() -> None:
+    """Profile process startup when ``GATEWAY_PROFILE_STARTUP`` is set.
+
+    The session runs for that many seconds from the moment this is called and
+    writes its report to ``GATEWAY_PROFILE_OUTPUT``
+    (default ``/tmp/gateway-startup.<mode>.txt``).
+    """
+
+    raw = os.getenv("GATEWAY_PROFILE_STARTUP", "").strip()
+    if not raw:
+        return
+    try:
+        seconds = min(float(raw), MAX_SECONDS)
+    except ValueError:
+        print(f"GATEWAY_PROFILE_STARTUP={raw!r} is not a number; startup profiling disabled", file=sys.stderr)
+        return
+    mode = os.getenv("GATEWAY_PROFILE_STARTUP_MODE", "sample").strip().lower() or "sample"
+    if mode not in MODES:
+        print(
+            f"GATEWAY_PROFILE_STARTUP_MODE={mode!r} is not one of {', '.join(MODES)}; using sample",
+            file=sys.stderr,
+        )
+        mode = "sample"
+    elif mode == "cprofile":
+        # cProfile only sees the thread that enabled it; the timer thread would profile nothing.
+        print("cprofile is not supported for startup profiling; using sample", file=sys.stderr)
+        mode = "sample"
+    output = os.getenv("GATEWAY_PROFILE_OUTPUT", "").strip() or f"/tmp/gateway-startup.{mode}.txt"
+
+    session = new_session(mode).start()
+
+    def _finish() -> None:
+        time.sleep(seconds)
+        session.stop()
+        with open(output, "w", encoding="utf-8") as fh:
+            fh.write(render(session))
+        print(f"startup profile ({mode}, {seconds:g}s) written to {output}", file=sys.stderr)
+
+    threading.Thread(target=_finish, name="gateway-startup-profile", daemon=True).start()
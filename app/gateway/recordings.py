@@ -0,0 +1,405 @@
+"""Recording archive: segment discovery, keyframe seek index and quota eviction.
+
+MediaMTX writes fixed-duration fMP4 segments (no transcoding) to
+``<root>/<camera>/<YYYY-mm-dd_HH-MM-SS-ffffff>.mp4``.  This module keeps a
+compact index over them:
+
+- per camera, a sorted array of segment start times (bisect → segment),
+- per segment, arrays of keyframe time offsets and ``moof`` byte offsets parsed
+  from the fMP4 fragment headers (bisect → byte offset),
+
+so any wall-clock timestamp resolves to a byte position in O(log n) without
+reading media data.  ``enforce_quota`` deletes the oldest closed segments once
+the archive grows past its byte budget.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+SEGMENT_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S-%f"
+SEGMENT_SUFFIX = ".mp4"
+
+_SIZE_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(raw: str) -> int:
+    """``"20G"`` → bytes. Plain integers are taken as bytes."""
+
+    raw = raw.strip().upper().removesuffix("B").removesuffix("I")
+    if raw and raw[-1] in _SIZE_SUFFIXES:
+        return int(float(raw[:-1]) * _SIZE_SUFFIXES[raw[-1]])
+    return int(raw)
+
+
+def parse_segment_start(name: str) -> Optional[float]:
+    if not name.endswith(SEGMENT_SUFFIX):
+        return None
+    try:
+        dt = datetime.strptime(name[: -len(SEGMENT_SUFFIX)], SEGMENT_TIME_FORMAT)
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+# --- fMP4 box parsing -------------------------------------------------------
+
+_SAMPLE_IS_NON_SYNC = 0x10000
+
+
+def _iter_boxes(fh: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int, int]]:
+    """Yield ``(type, box_offset, payload_offset, box_end)`` between two offsets."""
+
+    pos = start
+    while pos + 8 <= end:
+        fh.seek(pos)
+        header = fh.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header)
+        payload = pos + 8
+        if size == 1:
+            large = fh.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            payload += 8
+        elif size == 0:
+            size = end - pos
+        if size < payload - pos or pos + size > end:
+            # Truncated box: the segment is still being written.
+            return
+        yield kind, pos, payload, pos + size
+        pos += size
+
+
+def _children(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """In-memory variant of ``_iter_boxes`` for small container boxes."""
+
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        payload = pos + 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            payload += 8
+        elif size == 0:
+            size = end - pos
+        if size < 8 or pos + size > end:
+            return
+        yield kind, payload, pos + size
+        pos += size
+
+
+@dataclass
+class _Track:
+    timescale: int = 90000
+    is_video: bool = False
+    default_sample_flags: int = 0
+
+
+def _parse_moov(data: bytes) -> Dict[int, _Track]:
+    tracks: Dict[int, _Track] = {}
+    trex_flags: Dict[int, int] = {}
+    for kind, p, e in _children(data):
+        if kind == b"trak":
+            track_id, track = 0, _Track()
+            for k2, p2, e2 in _children(data, p, e):
+                if k2 == b"tkhd":
+                    version = data[p2]
+                    track_id = struct.unpack_from(">I", data, p2 + (20 if version == 1 else 12))[0]
+                elif k2 == b"mdia":
+                    for k3, p3, e3 in _children(data, p2, e2):
+                        if k3 == b"mdhd":
+                            version = data[p3]
+                            track.timescale = struct.unpack_from(">I", data, p3 + (20 if version == 1 else 12))[0]
+                        elif k3 == b"hdlr":
+                            track.is_video = data[p3 + 8 : p3 + 12] == b"vide"
+            tracks[track_id] = track
+        elif kind == b"mvex":
+            for k2, p2, e2 in _children(data, p, e):
+                if k2 == b"trex":
+                    track_id = struct.unpack_from(">I", data, p2 + 4)[0]
+                    trex_flags[track_id] = struct.unpack_from(">I", data, p2 + 20)[0]
+    for track_id, flags in trex_flags.items():
+        if track_id in tracks:
+            tracks[track_id].default_sample_flags = flags
+    return tracks
+
+
+def _parse_traf(data: bytes, p: int, e: int, tracks: Dict[int, _Track]) -> Optional[Tuple[_Track, int, bool]]:
+    """Return ``(track, base_decode_time, first_sample_is_sync)`` for a video traf."""
+
+    track: Optional[_Track] = None
+    default_flags: Optional[int] = None
+    decode_time: Optional[int] = None
+    first_flags: Optional[int] = None
+    for kind, bp, _be in _children(data, p, e):
+        if kind == b"tfhd":
+            flags = struct.unpack_from(">I", data, bp)[0] & 0xFFFFFF
+            track = tracks.get(struct.unpack_from(">I", data, bp + 4)[0])
+            if track is None or not track.is_video:
+                return None
+            off = bp + 8
+            for bit, width in ((0x1, 8), (0x2, 4), (0x8, 4), (0x10, 4)):
+                if flags & bit:
+                    off += width
+            if flags & 0x20:
+                default_flags = struct.unpack_from(">I", data, off)[0]
+        elif kind == b"tfdt":
+            version = data[bp]
+            fmt = ">Q" if version == 1 else ">I"
+            decode_time = struct.unpack_from(fmt, data, bp + 4)[0]
+        elif kind == b"trun":
+            flags = struct.unpack_from(">I", data, bp)[0] & 0xFFFFFF
+            off = bp + 8  # version/flags + sample_count
+            if flags & 0x1:
+                off += 4
+            if flags & 0x4:
+                first_flags = struct.unpack_from(">I", data, off)[0]
+            elif flags & 0x400:
+                off += 4 if flags & 0x100 else 0
+                off += 4 if flags & 0x200 else 0
+                first_flags = struct.unpack_from(">I", data, off)[0]
+    if track is None or decode_time is None:
+        return None
+    if first_flags is None:
+        first_flags = default_flags if default_flags is not None else track.default_sample_flags
+    return track, decode_time, not (first_flags & _SAMPLE_IS_NON_SYNC)
+
+
+@dataclass
+class SegmentIndex:
+    """Keyframe time offsets (seconds from segment start) → ``moof`` byte offsets.
+
+    ``duration`` is the time the indexed fragments cover: the last fragment's
+    start plus the spacing of the last two fragments (0 with fewer than two).
+    """
+
+    init_end: int
+    times: array
+    offsets: array
+    duration: float
+
+    def seek(self, offset_seconds: float) -> Tuple[float, int]:
+        i = bisect_right(self.times, offset_seconds) - 1
+        if i < 0:
+            return (self.times[0], self.offsets[0]) if self.times else (0.0, self.init_end)
+        return self.times[i], self.offsets[i]
+
+
+def index_segment(path: Path) -> SegmentIndex:
+    times, offsets = array("d"), array("Q")
+    tracks: Dict[int, _Track] = {}
+    init_end = 0
+    first_time: Optional[int] = None
+    last_time = 0.0
+    step = 0.0
+    size = path.stat().st_size
+    with path.open("rb") as fh:
+        for kind, box_offset, payload, box_end in _iter_boxes(fh, 0, size):
+            if kind == b"moov":
+                fh.seek(payload)
+                tracks = _parse_moov(fh.read(box_end - payload))
+                init_end = box_end
+            elif kind == b"moof" and tracks:
+                fh.seek(payload)
+                data = fh.read(box_end - payload)
+                for k2, p2, e2 in _children(data):
+                    if k2 != b"traf":
+                        continue
+                    parsed = _parse_traf(data, p2, e2, tracks)
+                    if parsed is None:
+                        continue
+                    track, decode_time, is_sync = parsed
+                    if first_time is None:
+                        first_time = decode_time
+                    t = (decode_time - first_time) / track.timescale
+                    if t > last_time:
+                        step, last_time = t - last_time, t
+                    if is_sync:
+                        times.append(t)
+                        offsets.append(box_offset)
+    return SegmentIndex(init_end=init_end, times=times, offsets=offsets, duration=last_time + step)
+
+
+# --- archive ----------------------------------------------------------------
+
+
+@dataclass
+class Segment:
+    camera: str
+    name: str
+    path: Path
+    start: float
+    size: int
+    mtime: float
+
+
+@dataclass
+class SeekResult:
+    segment: Segment
+    keyframe_time: float
+    offset: int
+    init_end: int
+
+
+class RecordingArchive:
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+        # camera -> (dir mtime, sorted starts, segments)
+        self._cameras: Dict[str, Tuple[float, array, List[Segment]]] = {}
+        # path -> (size, mtime, index)
+        self._indexes: Dict[Path, Tuple[int, float, SegmentIndex]] = {}
+
+    def cameras(self) -> List[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir())
+
+    def segments(self, camera: str) -> List[Segment]:
+        return self._camera(camera)[2]
+
+    def _camera(self, camera: str) -> Tuple[float, array, List[Segment]]:
+        if camera in ("", ".", "..") or "/" in camera or "\\" in camera:
+            return 0.0, array("d"), []
+        directory = self.root / camera
+        try:
+            dir_mtime = directory.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0, array("d"), []
+        with self._lock:
+            cached = self._cameras.get(camera)
+        # New files change the dir mtime; the open segment only grows, so its
+        # size is refreshed on access instead of rescanning everything.
+        if cached is not None and cached[0] == dir_mtime:
+            if cached[2]:
+                newest = cached[2][-1]
+                try:
+                    newest.size = newest.path.stat().st_size
+                except FileNotFoundError:
+                    pass
+            return cached
+        segments = []
+        for entry in os.scandir(directory):
+            start = parse_segment_start(entry.name)
+            if start is None or not entry.is_file():
+                continue
+            st = entry.stat()
+            segments.append(Segment(camera, entry.name, Path(entry.path), start, st.st_size, st.st_mtime))
+        segments.sort(key=lambda s: s.start)
+        entry_ = (dir_mtime, array("d", (s.start for s in segments)), segments)
+        with self._lock:
+            self._cameras[camera] = entry_
+        return entry_
+
+    def find(self, camera: str, name: str) -> Optional[Segment]:
+        for segment in self.segments(camera):
+            if segment.name == name:
+                return segment
+        return None
+
+    def index(self, segment: Segment) -> SegmentIndex:
+        st = segment.path.stat()
+        segment.size, segment.mtime = st.st_size, st.st_mtime
+        with self._lock:
+            cached = self._indexes.get(segment.path)
+        if cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime:
+            return cached[2]
+        idx = index_segment(segment.path)
+        with self._lock:
+            self._indexes[segment.path] = (st.st_size, st.st_mtime, idx)
+        return idx
+
+    def seek(self, camera: str, timestamp: float) -> Optional[SeekResult]:
+        """Resolve ``timestamp`` to a keyframe; ``None`` when no recording covers it."""
+
+        _mtime, starts, segments = self._camera(camera)
+        i = bisect_right(starts, timestamp) - 1
+        if i < 0:
+            return None
+        segment = segments[i]
+        idx = self.index(segment)
+        # Past the end of the newest segment, or in a gap (recording stopped,
+        # camera offline) before the next one. A segment too short to know its
+        # fragment spacing is taken to run up to its successor.
+        if idx.duration > 0:
+            end = segment.start + idx.duration
+        else:
+            end = starts[i + 1] if i + 1 < len(starts) else segment.start
+        if timestamp > end:
+            return None
+        keyframe_time, offset = idx.seek(timestamp - segment.start)
+        return SeekResult(segment, keyframe_time, offset, idx.init_end)
+
+    def total_bytes(self) -> int:
+        return sum(s.size for cam in self.cameras() for s in self.segments(cam))
+
+    def enforce_quota(self, max_bytes: int) -> List[Segment]:
+        """Delete the oldest closed segments until the archive fits ``max_bytes``."""
+
+        candidates: List[Segment] = []
+        total = 0
+        for camera in self.cameras():
+            segments = self.segments(camera)
+            total += sum(s.size for s in segments)
+            # The newest segment per camera is still being written.
+            candidates.extend(segments[:-1])
+        candidates.sort(key=lambda s: s.start)
+        removed = []
+        for segment in candidates:
+            if total <= max_bytes:
+                break
+            try:
+                segment.path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= segment.size
+            removed.append(segment)
+            with self._lock:
+                self._indexes.pop(segment.path, None)
+                self._cameras.pop(segment.camera, None)
+        return removed
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive ``(start, end)``.
+
+    Returns ``None`` when there is no (usable) Range header; raises ``ValueError``
+    when the range cannot be satisfied.
+    """
+
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    if not first:
+        length = int(last)
+        if length <= 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path: Path, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+    with path.open("rb") as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
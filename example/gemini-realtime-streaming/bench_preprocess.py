@@ -0,0 +1,137 @@
+"""フレーム前処理のベンチマークだよ⏱️ 素朴な 1 フレームずつの経路 vs バッチエンジン。
+
+複数カメラ分の合成フレーム（またはデモ動画のフレーム）を用意して、
+
+- ``per-frame``: これまでの ``stream_video.py`` と同じく、フレームごとに
+  ``asyncio.to_thread(cv2.resize)`` → ``asyncio.to_thread(cv2.imencode)``
+- ``batch``: ``frame_batch.BatchPreprocessor`` で全カメラ分をまとめて処理
+
+を同じ入力で回し、フレーム/秒と「CPU 1 コア秒あたりのフレーム数」を出すよ。
+
+```bash
+uv run python bench_preprocess.py --cameras 8 --frames 60
+uv run python bench_preprocess.py --video ../../app/web/demo/baby-monitor-2025-09-23T13-42-04-819Z.webm
+```
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Callable, List, Optional
+
+import cv2
+import numpy as np
+
+from frame_batch import BatchPreprocessor
+
+
+def _synthetic_frames(count: int, width: int, height: int) -> List[np.ndarray]:
+    rng = np.random.default_rng(0)
+    base = np.zeros((height, width, 3), dtype=np.uint8)
+    base[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)
+    base[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    frames = []
+    for _ in range(count):
+        noise = rng.integers(0, 32, size=base.shape, dtype=np.uint8)
+        frames.append(cv2.add(base, noise))
+    return frames
+
+
+def _video_frames(path: str, count: int) -> List[np.ndarray]:
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(frame)
+    capture.release()
+    if not frames:
+        raise SystemExit(f"動画 {path!r} からフレームを読めなかったよ💦")
+    return frames
+
+
+async def _per_frame(frames: List[np.ndarray], cameras: int, max_width: int, quality: int) -> int:
+    params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+
+    async def one_camera() -> int:
+        done = 0
+        for frame in frames:
+            if frame.shape[1] > max_width:
+                scale = max_width / frame.shape[1]
+                new_size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
+                frame = await asyncio.to_thread(cv2.resize, frame, new_size)
+            ok, encoded = await asyncio.to_thread(cv2.imencode, ".jpg", frame, params)
+            if ok:
+                encoded.tobytes()
+                done += 1
+        return done
+
+    return sum(await asyncio.gather(*(one_camera() for _ in range(cameras))))
+
+
+async def _batched(frames: List[np.ndarray], cameras: int, max_width: int, quality: int, workers: int) -> int:
+    done = 0
+    with BatchPreprocessor(max_width=max_width, jpeg_quality=quality, workers=workers) as engine:
+        for frame in frames:
+            results = await engine.process([(cam, frame) for cam in range(cameras)])
+            done += sum(r is not None for r in results)
+    return done
+
+
+def _measure(run: Callable[[], int]) -> dict:
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    frames = run()
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    return {
+        "frames": frames,
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "fps": frames / wall if wall else 0.0,
+        "fps_per_core": frames / cpu if cpu else 0.0,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="フレーム前処理（縮小 + JPEG）のベンチマークだよ")
+    parser.add_argument("--cameras", type=int, default=4, help="同時に処理するカメラ数")
+    parser.add_argument("--frames", type=int, default=60, help="カメラあたりのフレーム数")
+    parser.add_argument("--width", type=int, default=1920, help="合成フレームの横幅")
+    parser.add_argument("--height", type=int, default=1080, help="合成フレームの高さ")
+    parser.add_argument("--video", default=None, help="合成フレームの代わりに使う動画ファイル")
+    parser.add_argument("--max-width", type=int, default=640)
+    parser.add_argument("--jpeg-quality", type=int, default=80)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="バッチエンジンのワーカー数")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    args = parser.parse_args(argv)
+
+    if args.video:
+        frames = _video_frames(args.video, args.frames)
+    else:
+        frames = _synthetic_frames(args.frames, args.width, args.height)
+
+    results = {
+        "per-frame": _measure(lambda: asyncio.run(_per_frame(frames, args.cameras, args.max_width, args.jpeg_quality))),
+        "batch": _measure(
+            lambda: asyncio.run(_batched(frames, args.cameras, args.max_width, args.jpeg_quality, args.workers))
+        ),
+    }
+    if args.json:
+        print(json.dumps({"cameras": args.cameras, "workers": args.workers, "results": results}))
+        return 0
+    h, w = frames[0].shape[:2]
+    print(f"📐 入力 {w}x{h} × {args.cameras} カメラ × {len(frames)} フレーム → 横 {args.max_width}px / 品質 {args.jpeg_quality}")
+    for name, r in results.items():
+        print(f"{name:>9}: {r['fps']:8.1f} fps, {r['fps_per_core']:8.1f} fps/コア (wall {r['wall_s']:.2f}s, CPU {r['cpu_s']:.2f}s)")
+    base = results["per-frame"]["fps_per_core"]
+    if base:
+        print(f"✨ コアあたりのスループット: {results['batch']['fps_per_core'] / base:.2f} 倍")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,453 @@
+"""録画をリプレイしてパイプライン全体を測るベンチマークだよ🎞️
+
+``app/web/demo/*.webm`` みたいな録画を「ライブカメラのふり」をして等速（または早送り）で流し、
+``stream_video.py`` と同じ経路 —— 取り込み → 品質ゲート → バッチ前処理 → 解析クライアント —— に通すよ。
+解析先は ``stub_gemini.py`` のローカルスタブなので、API キーも通信費もいらないの。
+
+- ``--mode live``: Gemini Live API と同じ JSON メッセージ（``setup`` / ``realtimeInput``）を WebSocket で送るよ。
+  google-genai の Live クライアントは接続先を ``wss://`` に固定しちゃうので、ここでは同じワイヤ形式を話す
+  最小クライアントを使ってるの。フレームの送り方は ``stream_video._send_video_frames`` そのままだよ。
+- ``--mode rest``: 1 フレームずつ ``generateContent`` に投げるよ（ゲートウェイの ``/analyze`` と同じリクエスト形）。
+  ``--gateway http://localhost:8081`` を付けると、ゲートウェイの ``/analyze`` 経由で測れるよ
+  （ゲートウェイは ``GEMINI_API_BASE`` をスタブに向けて起動してね）。
+
+結果は回帰チェック向けの JSON で出すよ: スループット・ステージ別レイテンシ（p50/p95）・送信/見送りフレーム数・
+ワイヤ上のバイト数。``--history`` を付けると JSON Lines で追記するの。
+
+```bash
+uv run python bench_replay.py ../../app/web/demo/*.webm                 # 等速、1 fps で送信
+uv run python bench_replay.py ../../app/web/demo/*.webm --speed 8 --loops 5
+uv run python bench_replay.py ../../app/web/demo/*.webm --speed 0 --mode rest   # 待ち時間なしで最大速度
+```
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import cv2
+
+import stream_video
+from frame_batch import BatchPreprocessor
+from stub_gemini import StubGemini
+
+stream_video._use_tapo_example_modules()
+from frame_quality import FrameQualityScorer  # noqa: E402
+
+LIVE_PATH = "/ws/google.ai.generativelanguage.v1alpha.GenerativeService.BidiGenerateContent"
+_FRAME_RE = re.compile(r"frame (\d+)")
+
+
+def _summary(samples: List[float]) -> Dict[str, Optional[float]]:
+    """ミリ秒で count / mean / p50 / p95 / max を返すよ。"""
+
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    ms = sorted(s * 1000 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))]
+    return {
+        "count": len(ms),
+        "mean": round(statistics.fmean(ms), 3),
+        "p50": round(statistics.median(ms), 3),
+        "p95": round(p95, 3),
+        "max": round(ms[-1], 3),
+    }
+
+
+class ReplayCapture:
+    """録画ファイルをライブカメラみたいに読ませる ``cv2.VideoCapture`` 風のラッパーだよ。
+
+    ``speed > 0`` なら、再生開始からの経過時間 × ``speed`` の位置にある最新フレームを返す
+    （読むのが遅れたぶんのフレームは、本物のカメラと同じく読み捨て）。
+    ``speed == 0`` なら待たずに ``step`` フレームおきに返すよ。
+    """
+
+    def __init__(self, path: str, *, speed: float, step: int = 1, loops: int = 1):
+        self.path = path
+        self.speed = speed
+        self.step = max(1, step)
+        self.loops_left = max(1, loops)
+        self.capture_seconds: List[float] = []
+        self.frames_decoded = 0
+        self.frames_read = 0
+        self.video_seconds = 0.0
+        self._cap = self._open()
+        self.native_fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._offset = 0.0  # ループ分の動画時間
+        self._last_pts = 0.0
+        self._t0: Optional[float] = None
+        self._lookahead: Optional[float] = None  # grab 済みで未採用のフレームの pts
+
+    def _open(self) -> "cv2.VideoCapture":
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            raise SystemExit(f"録画 {self.path!r} を開けなかったよ💦")
+        return cap
+
+    def _grab(self) -> Optional[float]:
+        """次のフレームを grab して、その（ループ込みの）pts を返すよ。終わりなら ``None``。"""
+
+        while True:
+            if self._cap.grab():
+                self.frames_decoded += 1
+                pts = self._offset + self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                self._last_pts = pts
+                return pts
+            self.loops_left -= 1
+            if self.loops_left <= 0:
+                return None
+            self._cap.release()
+            self._cap = self._open()
+            self._offset = self._last_pts + 1 / self.native_fps
+
+    def isOpened(self) -> bool:  # noqa: N802 - cv2.VideoCapture と同じ名前
+        return True
+
+    def read(self) -> Tuple[bool, Any]:
+        ok, frame = self._read()
+        self.frames_read += int(ok)
+        return ok, frame
+
+    def _read(self) -> Tuple[bool, Any]:
+        if self._t0 is None:
+            self._t0 = time.monotonic()
+        busy = 0.0
+        frame = None
+        try:
+            if self.speed <= 0:
+                t = time.perf_counter()
+                for _ in range(self.step):
+                    pts = self._grab()
+                    if pts is None:
+                        return False, None
+                ok, frame = self._cap.retrieve()
+                busy += time.perf_counter() - t
+                self.video_seconds = pts
+                return ok, frame
+            while True:
+                t = time.perf_counter()
+                if self._lookahead is None:
+                    self._lookahead = self._grab()
+                busy += time.perf_counter() - t
+                if self._lookahead is None:
+                    return (frame is not None), frame
+                now_video = (time.monotonic() - self._t0) * self.speed
+                if self._lookahead > now_video:
+                    if frame is not None:
+                        return True, frame
+                    time.sleep((self._lookahead - now_video) / self.speed)
+                    continue
+                # このフレームはもう「放送済み」なので採用候補にして、次も済んでるか確かめるよ
+                t = time.perf_counter()
+                ok, frame = self._cap.retrieve()
+                busy += time.perf_counter() - t
+                self.video_seconds = self._lookahead
+                self._lookahead = None
+                if not ok:
+                    return False, None
+        finally:
+            self.capture_seconds.append(busy)
+
+    def release(self) -> None:
+        self._cap.release()
+
+
+class TimedScorer(FrameQualityScorer):
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.seconds: List[float] = []
+        self.rejected = 0
+
+    def score(self, frame: Any) -> Any:
+        t = time.perf_counter()
+        quality = super().score(frame)
+        self.seconds.append(time.perf_counter() - t)
+        self.rejected += int(not quality.ok)
+        return quality
+
+
+class TimedBatchPreprocessor(BatchPreprocessor):
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.seconds: List[float] = []
+        self.jpeg_bytes = 0
+
+    async def process(self, frames: Any) -> Any:
+        t = time.perf_counter()
+        results = await super().process(frames)
+        self.seconds.append(time.perf_counter() - t)
+        self.jpeg_bytes += sum(len(r) for r in results if r)
+        return results
+
+
+class _AnalysisClient:
+    """``send_realtime_input`` を持つ解析クライアントの共通部分（計測用）。"""
+
+    def __init__(self) -> None:
+        self.send_seconds: List[float] = []
+        self.frame_sent_at: List[float] = []
+        self.response_latency: List[float] = []
+        self.responses = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.messages_out = 0
+
+
+class WireLiveSession(_AnalysisClient):
+    """Gemini Live API と同じ JSON を ``ws://`` で送る最小クライアントだよ。
+
+    ``stream_video._send_video_frames`` が使う ``send_realtime_input(video=Blob)`` / ``(text=...)``
+    だけを、google-genai の ``AsyncSession`` と同じ形で実装してるの。
+    """
+
+    def __init__(self, ws: Any):
+        super().__init__()
+        self._ws = ws
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        raw = json.dumps(message, ensure_ascii=False)
+        self.bytes_out += len(raw.encode())
+        self.messages_out += 1
+        await self._ws.send(raw)
+
+    async def setup(self, args: argparse.Namespace) -> None:
+        await self._send(
+            {
+                "setup": {
+                    "model": f"models/{args.model}",
+                    "generationConfig": {
+                        "responseModalities": ["TEXT"],
+                        "temperature": args.temperature,
+                        "topP": args.top_p,
+                        "maxOutputTokens": args.max_output_tokens,
+                    },
+                    "systemInstruction": {"parts": [{"text": args.system_instruction}]},
+                }
+            }
+        )
+
+    async def send_realtime_input(self, *, video: Any = None, text: Optional[str] = None) -> None:
+        t = time.perf_counter()
+        if video is not None:
+            payload = {"video": {"data": base64.b64encode(video.data).decode("ascii"), "mimeType": video.mime_type}}
+        else:
+            payload = {"text": text}
+        await self._send({"realtimeInput": payload})
+        if video is not None:
+            self.send_seconds.append(time.perf_counter() - t)
+            self.frame_sent_at.append(time.perf_counter())
+
+    async def receive(self) -> AsyncIterator[Dict[str, Any]]:
+        async for raw in self._ws:
+            self.bytes_in += len(raw if isinstance(raw, bytes) else raw.encode())
+            yield json.loads(raw)
+
+    async def receive_loop(self) -> None:
+        with contextlib.suppress(asyncio.CancelledError):
+            async for message in self.receive():
+                turn = (message.get("serverContent") or {}).get("modelTurn")
+                if not turn:
+                    continue
+                self.responses += 1
+                text = "".join(p.get("text", "") for p in turn.get("parts", []))
+                match = _FRAME_RE.search(text)
+                if match and "text after" not in text:
+                    index = int(match.group(1)) - 1
+                    if 0 <= index < len(self.frame_sent_at):
+                        self.response_latency.append(time.perf_counter() - self.frame_sent_at[index])
+
+
+class RestSession(_AnalysisClient):
+    """1 フレームごとに generateContent（または ゲートウェイの /analyze）を呼ぶクライアントだよ。"""
+
+    def __init__(self, client: Any, *, stub_url: str, gateway: Optional[str], model: str, prompt: str):
+        super().__init__()
+        self._client = client
+        self._stub_url = stub_url
+        self._gateway = gateway.rstrip("/") if gateway else None
+        self._model = model
+        self._prompt = prompt
+
+    async def send_realtime_input(self, *, video: Any = None, text: Optional[str] = None) -> None:
+        if video is None:
+            return  # REST は 1 枚ずつ完結するので、前後の指示テキストは送らないよ
+        t = time.perf_counter()
+        if self._gateway:
+            files = {"image": ("frame.jpg", video.data, video.mime_type)}
+            request = self._client.build_request(
+                "POST", f"{self._gateway}/analyze", files=files, data={"prompt": self._prompt, "force": "true"}
+            )
+        else:
+            body = {
+                "contents": [
+                    {
+                        "role": "user",
+                        "parts": [
+                            {"text": self._prompt},
+                            {"inline_data": {"mime_type": video.mime_type, "data": base64.b64encode(video.data).decode("ascii")}},
+                        ],
+                    }
+                ]
+            }
+            request = self._client.build_request(
+                "POST", f"{self._stub_url}/v1beta/models/{self._model}:generateContent", params={"key": "stub"}, json=body
+            )
+        self.bytes_out += len(request.read())  # multipart はストリームなので先に読んでおくよ
+        self.messages_out += 1
+        response = await self._client.send(request)
+        self.bytes_in += len(response.content)
+        elapsed = time.perf_counter() - t
+        self.send_seconds.append(elapsed)
+        self.frame_sent_at.append(time.perf_counter())
+        if response.status_code == 200:
+            self.responses += 1
+            self.response_latency.append(elapsed)
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    probe = cv2.VideoCapture(args.video)
+    native_fps = probe.get(cv2.CAP_PROP_FPS) or 30.0
+    probe.release()
+    step = max(1, round(native_fps / args.fps)) if args.fps > 0 else 1
+    capture = ReplayCapture(args.video, speed=args.speed, step=step, loops=args.loops)
+    scorer = TimedScorer(min_sharpness=args.min_sharpness) if args.quality_gate else None
+    # 早送りのときは送信間隔も同じ倍率で縮めるよ（速度 0 なら待ち時間なし）
+    target_fps = args.fps * args.speed if args.speed > 0 else 0.0
+
+    async with StubGemini(latency=args.stub_latency, respond_every=args.respond_every) as stub:
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        with TimedBatchPreprocessor(max_width=args.max_width, jpeg_quality=args.jpeg_quality, workers=2) as engine:
+            send_kwargs = dict(
+                target_fps=target_fps,
+                max_frames=args.max_frames,
+                max_width=args.max_width,
+                jpeg_quality=args.jpeg_quality,
+                scorer=scorer,
+                max_defer=args.max_defer,
+                engine=engine,
+            )
+            # stream_video の進捗表示は stderr に逃がして、stdout は JSON だけにするよ
+            with contextlib.redirect_stdout(sys.stderr):
+                if args.mode == "live":
+                    from websockets.asyncio.client import connect
+
+                    async with connect(stub.live_url + LIVE_PATH + "?key=stub", max_size=None) as ws:
+                        session: _AnalysisClient = WireLiveSession(ws)
+                        await session.setup(args)
+                        receiver = asyncio.create_task(session.receive_loop())
+                        if args.prompt:
+                            await session.send_realtime_input(text=args.prompt)
+                        await stream_video._send_video_frames(session, capture, **send_kwargs)
+                        if args.final_prompt:
+                            await session.send_realtime_input(text=args.final_prompt)
+                        # 最後の応答を待つ（スタブの遅延ぶん + 少し）
+                        await asyncio.sleep(args.stub_latency + 0.2)
+                        receiver.cancel()
+                        with contextlib.suppress(asyncio.CancelledError):
+                            await receiver
+                else:
+                    import httpx
+
+                    async with httpx.AsyncClient(timeout=30.0) as client:
+                        session = RestSession(
+                            client, stub_url=stub.rest_url, gateway=args.gateway, model=args.model, prompt=args.prompt
+                        )
+                        await stream_video._send_video_frames(session, capture, **send_kwargs)
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+
+    sent = len(session.send_seconds)
+    captured = capture.frames_read
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "video": Path(args.video).name,
+        "mode": args.mode,
+        "via_gateway": bool(args.gateway) if args.mode == "rest" else False,
+        "speed": args.speed,
+        "fps": args.fps,
+        "loops": args.loops,
+        "quality_gate": args.quality_gate,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "video_s": round(capture.video_seconds, 3),
+        "frames": {
+            "decoded": capture.frames_decoded,
+            "captured": captured,
+            "low_quality": scorer.rejected if scorer else 0,
+            "sent": sent,
+            "skipped": captured - sent,
+        },
+        "throughput": {
+            "sent_fps": round(sent / wall, 3) if wall else None,
+            "captured_fps": round(captured / wall, 3) if wall else None,
+            "realtime_factor": round(capture.video_seconds / wall, 3) if wall else None,
+        },
+        "stages_ms": {
+            "capture": _summary(capture.capture_seconds),
+            "gate": _summary(scorer.seconds if scorer else []),
+            "preprocess": _summary(engine.seconds),
+            "send": _summary(session.send_seconds),
+            "response": _summary(session.response_latency),
+        },
+        "wire": {
+            "jpeg_bytes": engine.jpeg_bytes,
+            "bytes_out": session.bytes_out,
+            "bytes_in": session.bytes_in,
+            "messages_out": session.messages_out,
+            "responses": session.responses,
+        },
+        # ゲートウェイ経由のときはゲートウェイの先のスタブが受けるので、その集計は GET /stats で見てね
+        "stub": None if args.mode == "rest" and args.gateway else stub.stats.as_dict(),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="録画をリプレイしてパイプライン全体を測るベンチマークだよ")
+    parser.add_argument("video", help="リプレイする録画ファイル（例: ../../app/web/demo/*.webm）")
+    parser.add_argument("--mode", choices=("live", "rest"), default="live", help="解析クライアントの種類")
+    parser.add_argument("--gateway", default=None, help="rest モードでゲートウェイの /analyze を経由する（例: http://localhost:8081）")
+    parser.add_argument("--speed", type=float, default=1.0, help="再生速度（1=等速, 8=8 倍速, 0=待ち時間なしの最大速度）")
+    parser.add_argument("--loops", type=int, default=1, help="録画を何周流すか")
+    parser.add_argument("--fps", type=float, default=1.0, help="動画時間 1 秒あたりの送信フレーム数（stream_video.py の --fps と同じ）")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--max-width", type=int, default=640)
+    parser.add_argument("--jpeg-quality", type=int, default=80)
+    parser.add_argument(
+        "--quality-gate",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="品質ゲートを通す（既定は無効。stream_video.py の既定と同じ）",
+    )
+    parser.add_argument("--max-defer", type=int, default=5)
+    parser.add_argument("--min-sharpness", type=float, default=60.0)
+    parser.add_argument("--stub-latency", type=float, default=0.3, help="スタブが応答を返すまでの秒数")
+    parser.add_argument("--respond-every", type=int, default=5, help="live スタブが何フレームごとに応答するか")
+    parser.add_argument("--model", default=stream_video.DEFAULT_MODEL)
+    parser.add_argument("--prompt", default=stream_video.live.DEFAULT_PROMPT)
+    parser.add_argument("--final-prompt", default="これで映像の送信はおしまい！直近の気づきを手短にまとめてね✨")
+    parser.add_argument("--system-instruction", default="赤ちゃんモニターの安全管理アシスタントとして、危険や異常を素早く指摘して。")
+    parser.add_argument("--temperature", type=float, default=0.4)
+    parser.add_argument("--top-p", type=float, default=0.8)
+    parser.add_argument("--max-output-tokens", type=int, default=512)
+    parser.add_argument("--history", type=Path, default=None, help="結果を JSON Lines で追記するファイル")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(_run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.history:
+        with args.history.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
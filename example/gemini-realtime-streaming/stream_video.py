@@ -14,8 +14,24 @@ from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+from frame_batch import BatchPreprocessor
 
-DEFAULT_MODEL = "gemini-2.0-flash-live-preview-04-09"
+# frame_hub.py / frame_quality.py / tapo_cameras.py はお隣の tapo-rtsp-viewer サンプルに入ってるよ
+TAPO_EXAMPLE_DIR = Path(__file__).resolve().parents[1] / "tapo-rtsp-viewer"
+
+
+def _use_tapo_example_modules() -> None:
+    if str(TAPO_EXAMPLE_DIR) not in sys.path:
+        sys.path.insert(0, str(TAPO_EXAMPLE_DIR))
+
+
+_use_tapo_example_modules()
+import tapo_cameras  # noqa: E402,F401  app/gateway を sys.path に足してくれるよ
+
+# モデル・プロンプト・接続設定・応答の読み方はゲートウェイのライブ実況（app/gateway/live.py）と共通だよ
+import live  # noqa: E402
+
+DEFAULT_MODEL = live.DEFAULT_MODEL
 
 
 def _load_dotenv() -> None:
@@ -45,28 +61,57 @@ def _open_capture(source: int | str) -> cv2.VideoCapture:
     return capture
 
 
+def _camera_ai_url(name: str, cameras_file: Optional[str]) -> str:
+    """カメラ台帳から解析用ストリーム（既定はサブストリーム）の RTSP URL を決めるよ📒"""
+
+    _use_tapo_example_modules()
+    from tapo_cameras import RegistryError, load_registry
+
+    try:
+        camera = load_registry(cameras_file).get(name)
+    except RegistryError as exc:
+        raise SystemExit(f"カメラ台帳を読めなかったよ💦 {exc}") from exc
+    print(f"📷 {name}: {camera.safe_url(camera.ai_stream)} を解析するよ", file=sys.stderr)
+    return camera.rtsp_url(camera.ai_stream)
+
+
+def _open_hub_capture(name: str) -> Any:
+    """frame_hub.py のハブから読む。カメラへの RTSP 接続は増やさないよ📡"""
+
+    _use_tapo_example_modules()
+    from frame_hub import open_hub_capture
+
+    capture = open_hub_capture(name)
+    if capture is None:
+        raise SystemExit(f"フレームハブ {name!r} が見つからなかったよ💦 frame_hub.py --name {name} を先に起動してね")
+    return capture
+
+
 async def _iter_frames(
     capture: cv2.VideoCapture,
     *,
     target_fps: float,
     max_frames: Optional[int],
-    max_width: Optional[int],
-) -> AsyncIterator[Tuple[int, Any]]:
+    scorer: Any = None,
+) -> AsyncIterator[Tuple[int, Any, Any]]:
     interval = 1.0 / target_fps if target_fps > 0 else 0.0
     frame_index = 0
+
+    def _read() -> Tuple[bool, Any, Any]:
+        # 採点は縮小コピーで軽いので、読み込みと同じスレッド往復でやっちゃうよ
+        ok, frame = capture.read()
+        quality = scorer.score(frame) if ok and scorer is not None else None
+        return ok, frame, quality
+
     try:
         while True:
-            ok, frame = await asyncio.to_thread(capture.read)
+            ok, frame, quality = await asyncio.to_thread(_read)
             if not ok:
                 break
             frame_index += 1
             if max_frames is not None and frame_index > max_frames:
                 break
-            if max_width and frame.shape[1] > max_width:
-                scale = max_width / frame.shape[1]
-                new_size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
-                frame = await asyncio.to_thread(cv2.resize, frame, new_size)
-            yield frame_index, frame
+            yield frame_index, frame, quality
             if interval > 0:
                 await asyncio.sleep(interval)
     finally:
@@ -81,44 +126,61 @@ async def _send_video_frames(
     max_frames: Optional[int],
     max_width: Optional[int],
     jpeg_quality: int,
+    scorer: Any = None,
+    max_defer: int = 5,
+    engine: Optional[BatchPreprocessor] = None,
 ) -> None:
-    params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
-    async for frame_index, frame in _iter_frames(
-        capture,
-        target_fps=target_fps,
-        max_frames=max_frames,
-        max_width=max_width,
-    ):
-        success, encoded = await asyncio.to_thread(cv2.imencode, ".jpg", frame, params)
-        if not success:
-            print(f"⚠️ フレーム {frame_index} のエンコードに失敗したよ", file=sys.stderr)
-            continue
-        blob = types.Blob(data=encoded.tobytes(), mime_type="image/jpeg")
-        await session.send_realtime_input(video=blob)
-        print(f"📤 フレーム {frame_index} を送信中…", end="\r", flush=True)
+    held: Optional[Tuple[float, int, Any]] = None  # 見送ったフレームのうちいちばんマシなもの
+    deferred = 0
+    skipped = 0
+    # 縮小と JPEG 化は作業バッファを使い回すワーカープールで 1 タスクにまとめるよ。
+    # engine を渡されたらそれを使う（閉じるのは呼び出し側）。ベンチマークで計測用のエンジンを差し込むときとかにね
+    owned = engine is None
+    if engine is None:
+        engine = BatchPreprocessor(max_width=max_width, jpeg_quality=jpeg_quality, workers=2)
+    with engine if owned else contextlib.nullcontext(engine):
+        async for frame_index, frame, quality in _iter_frames(
+            capture,
+            target_fps=target_fps,
+            max_frames=max_frames,
+            scorer=scorer,
+        ):
+            if quality is not None and not quality.ok:
+                if held is None or quality.score > held[0]:
+                    held = (quality.score, frame_index, frame)
+                deferred += 1
+                if deferred <= max_defer:
+                    skipped += 1
+                    print(f"🌙 フレーム {frame_index} は見送り ({quality.reason})", end="\r", flush=True)
+                    continue
+                # ずっとダメなときは、候補の中でいちばんマシなフレームを送るよ
+                _score, frame_index, frame = held
+            held, deferred = None, 0
+            (encoded,) = await engine.process([("source", frame)])
+            if encoded is None:
+                print(f"⚠️ フレーム {frame_index} のエンコードに失敗したよ", file=sys.stderr)
+                continue
+            blob = types.Blob(data=encoded, mime_type="image/jpeg")
+            await session.send_realtime_input(video=blob)
+            print(f"📤 フレーム {frame_index} を送信中…", end="\r", flush=True)
     print()
+    if scorer is not None:
+        print(f"📉 品質ゲートで {skipped} フレームの送信を省いたよ")
 
 
 async def _receive_loop(session: genai.aio.live.AsyncSession) -> None:
     try:
-        async for message in session.receive():
-            if message.setup_complete:
+        async for event in live.receive_events(session):
+            if event["type"] == "ready":
                 print("✅ Gemini がリアルタイム準備OKだよ〜✨")
-                continue
-
-            if message.server_content and message.server_content.model_turn:
-                parts = message.server_content.model_turn.parts or []
-                for part in parts:
-                    if part.text:
-                        print(f"\n🤖 Gemini: {part.text}")
-
-            if message.usage_metadata:
-                usage = message.usage_metadata
-                prompt_tokens = usage.prompt_token_count or 0
-                response_tokens = usage.candidates_token_count or 0
+            elif event["type"] == "text":
+                print(f"\n🤖 Gemini: {event['text']}")
+            elif event["type"] == "usage":
                 print(
-                    f"\n📊 Token usage → prompt: {prompt_tokens}, response: {response_tokens}"
+                    f"\n📊 Token usage → prompt: {event['prompt_tokens']}, response: {event['response_tokens']}"
                 )
+    except ConnectionError:
+        print("\n🔌 Gemini との接続が切れたよ", file=sys.stderr)
     except asyncio.CancelledError:
         pass
 
@@ -126,23 +188,31 @@ async def _receive_loop(session: genai.aio.live.AsyncSession) -> None:
 async def _amain(args: argparse.Namespace) -> None:
     _load_dotenv()
     api_key = _require_api_key()
-    source = _resolve_source(args.source)
-    capture = _open_capture(source)
+    if args.hub:
+        capture = _open_hub_capture(args.hub)
+    elif args.camera:
+        capture = _open_capture(_camera_ai_url(args.camera, args.cameras_file))
+    else:
+        capture = _open_capture(_resolve_source(args.source))
 
     client = genai.Client(api_key=api_key, http_options={"api_version": "v1alpha"})
-    system_instruction = args.system_instruction.strip() if args.system_instruction else ""
-    config = types.LiveConnectConfig(
-        response_modalities=["TEXT"],
-        system_instruction=types.Content(
-            parts=[types.Part(text=system_instruction or "映像から重要ポイントを即座に伝えてね。")]
-        ),
-        generation_config=types.GenerationConfig(
+    config = live.connect_config(
+        live.LiveSettings(
+            model=args.model,
+            system_instruction=args.system_instruction.strip() if args.system_instruction else "",
             temperature=args.temperature,
             top_p=args.top_p,
             max_output_tokens=args.max_output_tokens,
-        ),
+        )
     )
 
+    scorer = None
+    if args.quality_gate:
+        _use_tapo_example_modules()
+        from frame_quality import FrameQualityScorer
+
+        scorer = FrameQualityScorer(min_sharpness=args.min_sharpness)
+
     async with client.aio.live.connect(model=args.model, config=config) as session:
         receiver = asyncio.create_task(_receive_loop(session))
 
@@ -157,6 +227,8 @@ async def _amain(args: argparse.Namespace) -> None:
             max_frames=args.max_frames,
             max_width=args.max_width,
             jpeg_quality=args.jpeg_quality,
+            scorer=scorer,
+            max_defer=args.max_defer,
         )
 
         final_prompt = args.final_prompt.strip()
@@ -178,6 +250,21 @@ def _parse_args(argv: list[str]) -> argparse.Namespace:
         default="0",
         help="映像ソース。Webカメラ番号 (例: 0) か動画ファイル/RTSP URL を指定してね",
     )
+    parser.add_argument(
+        "--hub",
+        default=None,
+        help="--source の代わりに frame_hub.py のハブ名を指定。カメラ接続をビューアたちと共有できるよ",
+    )
+    parser.add_argument(
+        "--camera",
+        default=None,
+        help="--source の代わりにカメラ台帳のカメラ名を指定。台帳の解析用ストリーム（既定はサブ）につなぐよ",
+    )
+    parser.add_argument(
+        "--cameras-file",
+        default=None,
+        help="カメラ台帳のパス（既定: $CAMERAS_FILE → app/config/cameras.toml）",
+    )
     parser.add_argument(
         "--model",
         default=DEFAULT_MODEL,
@@ -207,9 +294,27 @@ def _parse_args(argv: list[str]) -> argparse.Namespace:
         default=80,
         help="JPEG 品質 (0-100)。数値が高いほど高画質だけどデータ量も増えるよ",
     )
+    parser.add_argument(
+        "--quality-gate",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="ボケ・暗すぎ・露出調整中のフレームを送らずに見送るよ（既定は無効。ゲートウェイの GATEWAY_QUALITY_GATE と同じ）",
+    )
+    parser.add_argument(
+        "--max-defer",
+        type=int,
+        default=5,
+        help="連続で見送る最大フレーム数。超えたら候補の中でいちばんマシなフレームを送るよ",
+    )
+    parser.add_argument(
+        "--min-sharpness",
+        type=float,
+        default=60.0,
+        help="ボケ判定のしきい値（縮小版のラプラシアン分散）。暗い IR 映像で厳しすぎたら下げてね",
+    )
     parser.add_argument(
         "--prompt",
-        default="赤ちゃんの安全や快適さに関わるポイントをリアルタイムで教えて",
+        default=live.DEFAULT_PROMPT,
         help="最初に送る指示テキスト",
     )
     parser.add_argument(
@@ -225,25 +330,25 @@ def _parse_args(argv: list[str]) -> argparse.Namespace:
     )
     parser.add_argument(
         "--system-instruction",
-        default="赤ちゃんモニターの安全管理アシスタントとして、危険や異常を素早く指摘して。",
+        default=live.DEFAULT_SYSTEM_INSTRUCTION,
         help="システムプロンプトに設定する文章",
     )
     parser.add_argument(
         "--temperature",
         type=float,
-        default=0.4,
+        default=live.LiveSettings.temperature,
         help="生成温度。小さくすると安定、大きくすると多様性アップだよ",
     )
     parser.add_argument(
         "--top-p",
         type=float,
-        default=0.8,
+        default=live.LiveSettings.top_p,
         help="top-p サンプリングのしきい値",
     )
     parser.add_argument(
         "--max-output-tokens",
         type=int,
-        default=512,
+        default=live.LiveSettings.max_output_tokens,
         help="モデルの最大出力トークン数",
     )
     return parser.parse_args(argv)
@@ -0,0 +1,222 @@
+"""ローカルで動く Gemini のスタブサーバーだよ🧸 本物の API を叩かずにパイプラインを測るための相棒。
+
+- Live API（WebSocket）: ``setup`` に ``setupComplete`` を返して、``realtimeInput`` の映像フレームを数えるよ。
+  ``--respond-every`` フレームごと（とテキスト入力ごと）に、``--latency`` 秒待ってからテキスト応答を返すの。
+  応答のテキストには ``frame <N>``（N = それまでに受け取ったフレーム数）が入ってるから、遅延の計測に使えるよ。
+- REST（``POST /v1beta/models/<model>:generateContent``）: ``--latency`` 秒待って、決まった応答を返すよ。
+  ゲートウェイを ``GEMINI_API_BASE=http://127.0.0.1:<port>`` で起動すれば ``/analyze`` の経路も測れるの。
+- ``GET /stats``: 受け取ったフレーム数・バイト数などの集計（JSON）。
+
+```bash
+uv run python stub_gemini.py --port 8790            # REST は 8790、Live は 8791
+```
+
+``bench_replay.py`` は同じサーバーをプロセス内で起動して使うよ。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from websockets.asyncio.server import ServerConnection, serve
+
+
+@dataclass
+class StubStats:
+    live_sessions: int = 0
+    live_messages_in: int = 0
+    live_bytes_in: int = 0
+    live_frames: int = 0
+    live_frame_bytes: int = 0
+    live_responses: int = 0
+    live_bytes_out: int = 0
+    rest_requests: int = 0
+    rest_bytes_in: int = 0
+    rest_bytes_out: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class StubGemini:
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        live_port: Optional[int] = None,
+        latency: float = 0.3,
+        respond_every: int = 5,
+    ):
+        self.host = host
+        self.port = port
+        self.live_port = port + 1 if live_port is None and port else (live_port or 0)
+        self.latency = latency
+        self.respond_every = max(1, respond_every)
+        self.stats = StubStats()
+        self._rest: Optional[asyncio.AbstractServer] = None
+        self._live: Any = None
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def live_url(self) -> str:
+        return f"ws://{self.host}:{self.live_port}"
+
+    # --- Live API ---------------------------------------------------------
+
+    async def _reply(self, ws: ServerConnection, text: str) -> None:
+        await asyncio.sleep(self.latency)
+        message = json.dumps(
+            {
+                "serverContent": {"modelTurn": {"parts": [{"text": text}]}, "turnComplete": True},
+                "usageMetadata": {"promptTokenCount": 258, "candidatesTokenCount": 12},
+            },
+            ensure_ascii=False,
+        )
+        self.stats.live_responses += 1
+        self.stats.live_bytes_out += len(message.encode())
+        try:
+            await ws.send(message)
+        except Exception:  # クライアントが先に切断しても気にしないよ
+            pass
+
+    async def _live_session(self, ws: ServerConnection) -> None:
+        self.stats.live_sessions += 1
+        frames = 0
+        replies = set()
+        try:
+            async for raw in ws:
+                self.stats.live_messages_in += 1
+                self.stats.live_bytes_in += len(raw if isinstance(raw, bytes) else raw.encode())
+                message = json.loads(raw)
+                if "setup" in message:
+                    reply = json.dumps({"setupComplete": {}})
+                    self.stats.live_bytes_out += len(reply)
+                    await ws.send(reply)
+                    continue
+                realtime = message.get("realtimeInput") or {}
+                video = realtime.get("video") or realtime.get("mediaChunks", [None])[0]
+                if video:
+                    frames += 1
+                    self.stats.live_frames += 1
+                    self.stats.live_frame_bytes += len(base64.b64decode(video.get("data", "")))
+                    if frames % self.respond_every == 0:
+                        task = asyncio.create_task(self._reply(ws, f"stub: frame {frames} を見たよ"))
+                        replies.add(task)
+                        task.add_done_callback(replies.discard)
+                elif realtime.get("text"):
+                    task = asyncio.create_task(self._reply(ws, f"stub: text after frame {frames}"))
+                    replies.add(task)
+                    task.add_done_callback(replies.discard)
+        except Exception:
+            pass
+        finally:
+            for task in replies:
+                task.cancel()
+
+    # --- REST -------------------------------------------------------------
+
+    async def _handle_rest(self, method: str, path: str, body: bytes) -> "tuple[str, bytes]":
+        if method == "GET" and path.startswith("/stats"):
+            return "200 OK", json.dumps(self.stats.as_dict()).encode()
+        if method == "POST" and ":generateContent" in path:
+            self.stats.rest_requests += 1
+            self.stats.rest_bytes_in += len(body)
+            await asyncio.sleep(self.latency)
+            payload = {
+                "candidates": [{"content": {"parts": [{"text": "stub: 赤ちゃんはすやすや寝てるよ"}], "role": "model"}}],
+                "usageMetadata": {"promptTokenCount": 258, "candidatesTokenCount": 12},
+            }
+            data = json.dumps(payload, ensure_ascii=False).encode()
+            self.stats.rest_bytes_out += len(data)
+            return "200 OK", data
+        return "404 Not Found", b'{"error": "not found"}'
+
+    async def _rest_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # keep-alive: 同じ接続でリクエストが続くかぎり処理するよ
+            while True:
+                request_line = (await reader.readline()).decode("latin-1").split()
+                if not request_line:
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0") or 0))
+                method, path = (request_line + ["", ""])[:2]
+                status, data = await self._handle_rest(method, path, body)
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # --- 起動と停止 --------------------------------------------------------
+
+    async def start(self) -> "StubGemini":
+        self._rest = await asyncio.start_server(self._rest_connection, self.host, self.port)
+        self.port = self._rest.sockets[0].getsockname()[1]
+        self._live = await serve(self._live_session, self.host, self.live_port, max_size=None)
+        self.live_port = self._live.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._rest is not None:
+            self._rest.close()
+        if self._live is not None:
+            self._live.close()
+            await self._live.wait_closed()
+
+    async def __aenter__(self) -> "StubGemini":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+
+async def _serve_forever(args: argparse.Namespace) -> None:
+    async with StubGemini(
+        host=args.host, port=args.port, latency=args.latency, respond_every=args.respond_every
+    ) as stub:
+        print(f"🧸 REST: {stub.rest_url}  Live: {stub.live_url}  (応答まで {args.latency}s)")
+        started = time.monotonic()
+        while True:
+            await asyncio.sleep(10)
+            print(f"[{time.monotonic() - started:6.0f}s] {json.dumps(stub.stats.as_dict())}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gemini Live/REST のローカルスタブだよ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790, help="REST のポート（Live はこの +1）")
+    parser.add_argument("--latency", type=float, default=0.3, help="応答を返すまでの秒数")
+    parser.add_argument("--respond-every", type=int, default=5, help="Live で何フレームごとに応答するか")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+"""1 台のカメラを 1 回だけデコードして、複数のローカルプロセスに配るフレームハブだよ。
+
+Tapo C210 は同時 RTSP セッション数が少ないから、ビューア・スナップショット・AI 解析が
+それぞれ ``cv2.VideoCapture`` を開くと枠がすぐ埋まるし、デコード CPU も人数分かかっちゃう。
+このハブはカメラに 1 本だけ接続してデコードし、``multiprocessing.shared_memory`` 上の
+リングバッファにフレームを書き込むよ。``HubReader`` は NumPy のビューとしてコピーなしで読めるし、
+``HubCapture``（``cv2.VideoCapture`` の代わり）は上書きされていないのを確かめたコピーを返すよ。
+
+使用例
+------
+
+```bash
+# ハブを起動（接続先はカメラ台帳か .env の TAPO_* を使うよ）
+uv run python frame_hub.py --name cam
+uv run python frame_hub.py --camera nursery --role ai   # 台帳のカメラの解析用サブストリームを配る
+
+# 別ターミナルから、ハブ経由で視聴・保存
+uv run python tapo_c210_rtsp_viewer.py --hub cam
+uv run python tapo_c210_snapshot.py --hub cam --output snapshot.jpg
+```
+
+共有メモリのレイアウト
+----------------------
+
+``[ヘッダ 64B][スロットごとのメタ (seq: u64, timestamp: f64) × slots][フレーム × slots]``
+
+書き手はフレーム番号 ``n`` をスロット ``n % slots`` に書くよ。書き込み中はそのスロットの
+``seq`` を 0 にしておき、書き終えたら ``n`` を入れてからヘッダの ``latest`` を更新する
+（seqlock みたいな感じ）。読み手は読み終わったあとに ``is_current(seq)`` で上書きされて
+いないかを確認できるよ。フレームを長く持ちたいときは ``frame.copy()`` してね。
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2  # type: ignore
+except ImportError as exc:  # pragma: no cover - OpenCV は外部依存
+    raise SystemExit(
+        "OpenCV が必要だよ。'uv sync' で環境構築するか、'python3 -m pip install opencv-python' でインストールしてね。"
+    ) from exc
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from tapo_cameras import Camera
+
+
+def _load_default_env() -> None:
+    """カレントディレクトリとスクリプト直下の ``.env`` を読み込むよ。"""
+
+    for candidate in (Path(__file__).with_name(".env"), Path.cwd() / ".env"):
+        if candidate.exists():
+            load_dotenv(candidate, override=False)
+
+
+MAGIC = 0x54484231  # "THB1"
+HEADER_SIZE = 64
+# magic, slots, height, width, channels, writer_pid, closed, latest, heartbeat
+_HEADER = struct.Struct("<IIIIIII4xQd")
+_SLOT_META = struct.Struct("<Qd")
+DEFAULT_SLOTS = 8
+DEFAULT_STALE_AFTER = 5.0
+
+
+def shm_name(name: str) -> str:
+    return f"tapo-hub-{name}"
+
+
+class HubInUseError(RuntimeError):
+    """同じ名前のハブがもう動いているよ。"""
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # 別ユーザーのプロセスだけど、生きてはいるよ
+    return True
+
+
+def running_hub_pid(name: str) -> Optional[int]:
+    """同じ名前のハブが動いていればその pid、いなければ ``None`` だよ。"""
+
+    try:
+        shm = _attach(name)
+    except FileNotFoundError:
+        return None
+    try:
+        magic, _slots, _h, _w, _c, pid, closed, *_ = _HEADER.unpack_from(shm.buf, 0)
+    finally:
+        shm.close()
+    if magic == MAGIC and not closed and pid != os.getpid() and _pid_alive(pid):
+        return pid
+    return None
+
+
+def _layout(slots: int, height: int, width: int, channels: int) -> Tuple[int, int, int]:
+    frame_bytes = height * width * channels
+    meta_offset = HEADER_SIZE
+    data_offset = meta_offset + _SLOT_META.size * slots
+    # フレームを 64 バイト境界にそろえて、NumPy/OpenCV が扱いやすいようにするよ。
+    data_offset = (data_offset + 63) // 64 * 64
+    return frame_bytes, data_offset, data_offset + frame_bytes * slots
+
+
+class HubWriter:
+    """ハブ側: フレームをリングに書き込むよ。"""
+
+    def __init__(self, name: str, shape: Tuple[int, int, int], slots: int = DEFAULT_SLOTS):
+        height, width, channels = shape
+        self.slots = slots
+        self.shape = shape
+        self.frame_bytes, self.data_offset, total = _layout(slots, height, width, channels)
+        pid = running_hub_pid(name)
+        if pid is not None:
+            # 動いているハブの領域を消すと、その読み手がみんな迷子になっちゃう。
+            raise HubInUseError(f"ハブ {name!r} はもう pid {pid} で動いてるよ")
+        try:
+            stale = shared_memory.SharedMemory(name=shm_name(name))
+        except FileNotFoundError:
+            pass
+        else:
+            # 前回のハブが落ちて残った領域（書き手はもういない）は作り直すよ。
+            stale.close()
+            stale.unlink()
+        self.shm = shared_memory.SharedMemory(name=shm_name(name), create=True, size=total)
+        self.buf = self.shm.buf
+        self.seq = 0
+        self._frames = np.ndarray((slots, height, width, channels), dtype=np.uint8, buffer=self.buf, offset=self.data_offset)
+        self._write_header(closed=0)
+
+    def _write_header(self, closed: int) -> None:
+        height, width, channels = self.shape
+        _HEADER.pack_into(
+            self.buf, 0, MAGIC, self.slots, height, width, channels, os.getpid(), closed, self.seq, time.time()
+        )
+
+    def publish(self, frame: np.ndarray) -> int:
+        if frame.shape != self.shape:
+            # 解像度が途中で変わっても、リングの形はそのまま保つよ。
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+        seq = self.seq + 1
+        slot = seq % self.slots
+        meta_offset = HEADER_SIZE + slot * _SLOT_META.size
+        _SLOT_META.pack_into(self.buf, meta_offset, 0, 0.0)
+        np.copyto(self._frames[slot], frame)
+        _SLOT_META.pack_into(self.buf, meta_offset, seq, time.time())
+        self.seq = seq
+        self._write_header(closed=0)
+        return seq
+
+    def heartbeat(self) -> None:
+        self._write_header(closed=0)
+
+    def close(self) -> None:
+        self._write_header(closed=1)
+        # NumPy のビューが残っていると close できないので先に外すよ。
+        del self._frames
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=shm_name(name))
+    # Python 3.12 以前は読み手でも resource_tracker が登録して、終了時に領域を消しちゃう。
+    # 持ち主はハブなので、読み手側では登録を外しておくよ。
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:
+        pass
+    return shm
+
+
+@dataclass
+class HubFrame:
+    seq: int
+    timestamp: float
+    image: np.ndarray
+
+
+class HubReader:
+    """読み手側: 最新フレームを NumPy ビューとしてコピーなしで返すよ。"""
+
+    def __init__(self, name: str, *, wait: float = 10.0, stale_after: float = DEFAULT_STALE_AFTER):
+        self.name = name
+        self.stale_after = stale_after
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                self.shm = _attach(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.1)
+        self.buf = self.shm.buf
+        magic, slots, height, width, channels, *_ = _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise RuntimeError(f"共有メモリ {shm_name(name)!r} はフレームハブの形式じゃないみたい")
+        self.slots = slots
+        self.shape = (height, width, channels)
+        _frame_bytes, data_offset, _total = _layout(slots, height, width, channels)
+        self._frames = np.ndarray((slots, height, width, channels), dtype=np.uint8, buffer=self.buf, offset=data_offset)
+
+    def _header(self) -> Tuple[int, int, float]:
+        *_, closed, latest, heartbeat = _HEADER.unpack_from(self.buf, 0)
+        return closed, latest, heartbeat
+
+    def _slot_meta(self, slot: int) -> Tuple[int, float]:
+        return _SLOT_META.unpack_from(self.buf, HEADER_SIZE + slot * _SLOT_META.size)
+
+    def alive(self) -> bool:
+        closed, _latest, heartbeat = self._header()
+        return not closed and time.time() - heartbeat < self.stale_after
+
+    def is_current(self, seq: int) -> bool:
+        """読み終わったフレームがまだ上書きされていないかを確認するよ。"""
+
+        return self._slot_meta(seq % self.slots)[0] == seq
+
+    def read(self, after: int = 0, timeout: Optional[float] = None) -> Optional[HubFrame]:
+        """``after`` より新しいフレームを待って返すよ。ハブが止まっていたら ``None``。"""
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            closed, latest, heartbeat = self._header()
+            if closed or time.time() - heartbeat > self.stale_after:
+                return None
+            if latest > after:
+                slot = latest % self.slots
+                seq, timestamp = self._slot_meta(slot)
+                if seq == latest:
+                    return HubFrame(seq, timestamp, self._frames[slot])
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(0.002)
+
+    def close(self) -> None:
+        del self._frames
+        self.buf = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # 呼び出し側がまだフレームのビューを持っているときは、GC に任せるよ。
+            pass
+
+
+class HubCapture:
+    """``cv2.VideoCapture`` っぽく使えるハブの読み手だよ。既存スクリプトの差し替え用。"""
+
+    def __init__(self, name: str, *, wait: float = 10.0):
+        try:
+            self._reader: Optional[HubReader] = HubReader(name, wait=wait)
+        except FileNotFoundError:
+            self._reader = None
+        self._last_seq = 0
+
+    def isOpened(self) -> bool:  # noqa: N802 - cv2.VideoCapture に合わせた名前
+        return self._reader is not None and self._reader.alive()
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if self._reader is None:
+            return False, None
+        while True:
+            frame = self._reader.read(after=self._last_seq, timeout=self._reader.stale_after)
+            if frame is None:
+                return False, None
+            # cv2.VideoCapture と同じく呼び出し側のものになるコピーを返すよ（サブストリームなら安いの）。
+            # コピー中に書き手が一周して上書きしていたら、ちぎれたフレームなので読み直すね。
+            image = frame.image.copy()
+            if self._reader.is_current(frame.seq):
+                self._last_seq = frame.seq
+                return True, image
+
+    def grab(self) -> bool:
+        ok, _ = self.read()
+        return ok
+
+    def set(self, prop_id: int, value: float) -> bool:
+        return False
+
+    def release(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+def open_hub_capture(name: str, wait: float = 10.0) -> Optional[HubCapture]:
+    capture = HubCapture(name, wait=wait)
+    if not capture.isOpened():
+        capture.release()
+        return None
+    return capture
+
+
+# --- ハブ本体 ---------------------------------------------------------------
+
+
+@dataclass
+class HubConfig:
+    name: str
+    camera: "Camera"
+    stream: int = 1
+    slots: int = DEFAULT_SLOTS
+    reconnect_delay: float = 5.0
+
+    def rtsp_url(self) -> str:
+        return self.camera.rtsp_url(self.stream)
+
+    def safe_display_target(self) -> str:
+        return self.camera.safe_url(self.stream)
+
+
+def parse_args(argv: Optional[list[str]] = None) -> HubConfig:
+    _load_default_env()
+    # 読み手側（open_hub_capture）では台帳はいらないので、ハブを起動するときだけ読み込むよ
+    from tapo_cameras import add_camera_arguments, resolve_camera
+
+    def _env(name: str) -> Optional[str]:
+        value = (os.getenv(name) or "").strip()
+        return value or None
+
+    parser = argparse.ArgumentParser(description="カメラを 1 回だけデコードして共有メモリで配るフレームハブだよ。")
+    parser.add_argument("--name", default=_env("TAPO_HUB"), help="ハブ名（読み手の --hub と合わせてね）。既定はカメラ名")
+    add_camera_arguments(parser)
+    parser.add_argument(
+        "--role",
+        choices=("view", "ai"),
+        default="view",
+        help="台帳のどのストリームを配るか（view=視聴用メイン, ai=解析用サブ）。--stream で直接指定も OK",
+    )
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS, help="リングバッファのフレーム数")
+    parser.add_argument("--reconnect-delay", type=float, default=float(_env("TAPO_RECONNECT_DELAY") or 5.0), help="再接続までの待機秒数")
+    args = parser.parse_args(argv)
+    camera, stream = resolve_camera(parser, args, role=args.role)
+    return HubConfig(
+        name=args.name or camera.name,
+        camera=camera,
+        stream=stream,
+        slots=max(2, args.slots),
+        reconnect_delay=args.reconnect_delay,
+    )
+
+
+def run_hub(config: HubConfig) -> None:
+    writer: Optional[HubWriter] = None
+
+    def _wait_reconnect() -> None:
+        # 再接続待ちの間もハートビートを打って、読み手に「まだ生きてるよ」と伝えるよ。
+        deadline = time.monotonic() + config.reconnect_delay
+        while time.monotonic() < deadline:
+            if writer is not None:
+                writer.heartbeat()
+            time.sleep(min(1.0, config.reconnect_delay))
+
+    pid = running_hub_pid(config.name)
+    if pid is not None:
+        raise HubInUseError(f"ハブ {config.name!r} はもう pid {pid} で動いてるよ。止めてから起動してね")
+    print(f"{config.safe_display_target()!r} をハブ {config.name!r} として配信するよ")
+    try:
+        while True:
+            capture = cv2.VideoCapture(config.rtsp_url(), cv2.CAP_FFMPEG)
+            if not capture.isOpened():
+                capture.release()
+                print("RTSP ストリームを開けなかったよ。IP・認証情報・RTSP 設定を確認してね。")
+                _wait_reconnect()
+                continue
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            try:
+                while True:
+                    ok, frame = capture.read()
+                    if not ok:
+                        print("カメラとの接続が切れたよ。再接続を試みるね。")
+                        break
+                    if writer is None:
+                        writer = HubWriter(config.name, frame.shape, config.slots)
+                        h, w = frame.shape[:2]
+                        print(f"共有メモリ {shm_name(config.name)!r} を作ったよ（{w}x{h}, {config.slots} スロット）")
+                    writer.publish(frame)
+            finally:
+                capture.release()
+            _wait_reconnect()
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    config = parse_args(argv)
+    try:
+        run_hub(config)
+    except HubInUseError as exc:
+        print(exc)
+        return 1
+    except KeyboardInterrupt:
+        print("ユーザー操作で中断されたよ。ハブを止めるね。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
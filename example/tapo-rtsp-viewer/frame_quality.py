@@ -0,0 +1,40 @@
+"""フレームの「使える度」をサクッと採点するスコアラーだよ🌙
+
+夜になると Tapo は赤外線（IR）モードに切り替わって、ボケたフレーム・暗すぎるフレーム・
+露出を合わせている最中のフレームがいっぱい出てくるの。そういうフレームを Gemini に送ったり
+スナップショットに保存したりするのはもったいないから、縮小コピーの上で軽く採点するよ。
+
+- ボケ: ラプラシアンの分散（小さいほどボケてる）
+- 露出: 輝度ヒストグラムの平均と、黒つぶれ/白とびの割合
+- 安定度: 前フレームとの平均輝度の差（露出調整中は大きく揺れる）と、画素差の平均
+
+すべて横 ``width`` px（既定 160）のグレースケール縮小版で計算するから、フル HD でも 1 フレーム 1 ms もかからないよ。
+
+採点の本体はゲートウェイの ``app/gateway/quality.py`` にあって、ここはそれを読み込むだけ。
+ゲートウェイの画質ゲート（``/analyze``）とまったく同じ点数になるよ。
+"""
+from __future__ import annotations
+
+import tapo_cameras  # noqa: F401  app/gateway を sys.path に足してくれるよ
+
+from quality import (  # noqa: E402
+    DEFAULT_MAX_BRIGHTNESS,
+    DEFAULT_MAX_BRIGHTNESS_JUMP,
+    DEFAULT_MAX_CLIPPED,
+    DEFAULT_MIN_BRIGHTNESS,
+    DEFAULT_MIN_SHARPNESS,
+    DEFAULT_WIDTH,
+    FrameQualityScorer,
+)
+from quality import Quality as FrameQuality  # noqa: E402
+
+__all__ = [
+    "DEFAULT_MAX_BRIGHTNESS",
+    "DEFAULT_MAX_BRIGHTNESS_JUMP",
+    "DEFAULT_MAX_CLIPPED",
+    "DEFAULT_MIN_BRIGHTNESS",
+    "DEFAULT_MIN_SHARPNESS",
+    "DEFAULT_WIDTH",
+    "FrameQuality",
+    "FrameQualityScorer",
+]
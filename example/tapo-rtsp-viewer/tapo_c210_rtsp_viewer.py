@@ -11,6 +11,9 @@ python3 tapo_c210_rtsp_viewer.py \
     --username camera_user \
     --password "strong-password" \
     --stream 1
+
+# カメラ台帳（app/config/cameras.toml）のカメラを名前で選ぶ
+python3 tapo_c210_rtsp_viewer.py --camera nursery
 ```
 
 OpenCV のウィンドウで ``Q`` キーを押すか、ターミナルで ``Ctrl+C`` を押すと終了できるよ。
@@ -45,6 +48,9 @@ def _load_default_env() -> None:
 
 _load_default_env()
 
+from frame_hub import open_hub_capture  # noqa: E402 - .env を読んだあとに import するよ
+from tapo_cameras import Camera, add_camera_arguments, resolve_camera  # noqa: E402
+
 
 DEFAULT_RECONNECT_DELAY = 5.0
 WINDOW_TITLE = "Tapo C210 Live"
@@ -52,25 +58,29 @@ WINDOW_TITLE = "Tapo C210 Live"
 
 @dataclass
 class ViewerConfig:
-    host: str
-    username: str
-    password: str
+    camera: Optional[Camera]
     stream: int = 1
-    port: int = 554
     reconnect_delay: float = DEFAULT_RECONNECT_DELAY
     no_window: bool = False
     frame_log_interval: int = 60
+    hub: Optional[str] = None
 
     def rtsp_url(self) -> str:
-        return f"rtsp://{self.username}:{self.password}@{self.host}:{self.port}/stream{self.stream}"
+        assert self.camera is not None
+        return self.camera.rtsp_url(self.stream)
 
     def safe_display_target(self) -> str:
         """Return a version of the RTSP URL without embedding credentials."""
 
-        return f"rtsp://{self.host}:{self.port}/stream{self.stream}"
+        if self.hub:
+            return f"hub:{self.hub}"
+        assert self.camera is not None
+        return self.camera.safe_url(self.stream)
 
 
 def parse_args(argv: Optional[list[str]] = None) -> ViewerConfig:
+    # カメラの接続先（TAPO_HOST など）は tapo_cameras.py が台帳か .env から決めるよ。
+    # ここで読むのはビューア自身の設定だけ。
     def _optional_str(name: str) -> Optional[str]:
         value = os.getenv(name)
         if value is None:
@@ -111,18 +121,12 @@ def parse_args(argv: Optional[list[str]] = None) -> ViewerConfig:
         )
 
     env_defaults = {
-        "host": _optional_str("TAPO_HOST"),
-        "username": _optional_str("TAPO_USERNAME"),
-        "password": _optional_str("TAPO_PASSWORD"),
-        "stream": _optional_int("TAPO_STREAM"),
-        "port": _optional_int("TAPO_PORT"),
+        "hub": _optional_str("TAPO_HUB"),
         "reconnect_delay": _optional_float("TAPO_RECONNECT_DELAY"),
         "no_window": _optional_bool("TAPO_NO_WINDOW"),
         "frame_log_interval": _optional_int("TAPO_FRAME_LOG_INTERVAL"),
     }
 
-    default_stream = env_defaults["stream"] if env_defaults["stream"] is not None else 1
-    default_port = env_defaults["port"] if env_defaults["port"] is not None else 554
     default_reconnect_delay = (
         env_defaults["reconnect_delay"] if env_defaults["reconnect_delay"] is not None else DEFAULT_RECONNECT_DELAY
     )
@@ -134,37 +138,7 @@ def parse_args(argv: Optional[list[str]] = None) -> ViewerConfig:
     parser = argparse.ArgumentParser(
         description="OpenCV で Tapo C210 の RTSP 映像を視聴するためのツールだよ。"
     )
-    parser.add_argument(
-        "--host",
-        required=env_defaults["host"] is None,
-        default=env_defaults["host"],
-        help="カメラの IPv4 アドレスまたはホスト名",
-    )
-    parser.add_argument(
-        "--username",
-        required=env_defaults["username"] is None,
-        default=env_defaults["username"],
-        help="Tapo アプリで設定したカメラアカウントのユーザー名",
-    )
-    parser.add_argument(
-        "--password",
-        required=env_defaults["password"] is None,
-        default=env_defaults["password"],
-        help="Tapo アプリで設定したカメラアカウントのパスワード",
-    )
-    parser.add_argument(
-        "--stream",
-        type=int,
-        default=default_stream,
-        choices=(1, 2, 6, 7),
-        help="RTSP ストリーム番号 (1=メイン HD, 2=サブ, 6/7=デュアルレンズモデル)",
-    )
-    parser.add_argument(
-        "--port",
-        type=int,
-        default=default_port,
-        help="RTSP ポート番号 (既定値 554)",
-    )
+    add_camera_arguments(parser)
     parser.add_argument(
         "--reconnect-delay",
         type=float,
@@ -190,17 +164,21 @@ def parse_args(argv: Optional[list[str]] = None) -> ViewerConfig:
         default=default_frame_log_interval,
         help="指定したフレーム数ごとにステータスを表示",
     )
+    parser.add_argument(
+        "--hub",
+        default=env_defaults["hub"],
+        help="カメラに直接つながず、frame_hub.py のハブ（名前を指定）からフレームを読むよ",
+    )
 
     args = parser.parse_args(argv)
+    camera, stream = (None, args.stream or 1) if args.hub else resolve_camera(parser, args, role="view")
     return ViewerConfig(
-        host=args.host,
-        username=args.username,
-        password=args.password,
-        stream=args.stream,
-        port=args.port,
+        camera=camera,
+        stream=stream,
         reconnect_delay=args.reconnect_delay,
         no_window=args.no_window,
         frame_log_interval=args.frame_log_interval,
+        hub=args.hub,
     )
 
 
@@ -217,11 +195,11 @@ def open_capture(url: str) -> Optional["cv2.VideoCapture"]:
 
 def view_stream(config: ViewerConfig) -> None:
     frame_count = 0
-    url = config.rtsp_url()
+    url = None if config.hub else config.rtsp_url()
     print(f"{config.safe_display_target()!r} に接続中だよ")
 
     while True:
-        capture = open_capture(url)
+        capture = open_hub_capture(config.hub) if config.hub else open_capture(url)
         if capture is None:
             print(
                 "RTSP ストリームを開けなかったよ。IP・認証情報・RTSP 設定を確認してね。"
@@ -5,10 +5,11 @@
 使用例
 ------
 
-1) .env を使う（`TAPO_HOST`, `TAPO_USERNAME`, `TAPO_PASSWORD` を設定しておく）
+1) カメラ台帳（`app/config/cameras.toml`）か .env（`TAPO_HOST`, `TAPO_USERNAME`, `TAPO_PASSWORD`）を使う
 
 ```bash
 uv run python tapo_c210_snapshot.py --output snapshot.jpg
+uv run python tapo_c210_snapshot.py --camera nursery --output nursery.jpg
 ```
 
 2) 直接引数で指定する
@@ -52,30 +53,38 @@ def _load_default_env() -> None:
 
 _load_default_env()
 
+from frame_hub import open_hub_capture  # noqa: E402 - .env を読んだあとに import するよ
+from frame_quality import FrameQualityScorer  # noqa: E402
+from tapo_cameras import Camera, add_camera_arguments, resolve_camera  # noqa: E402
+
 
 DEFAULT_STREAM = 1
-DEFAULT_PORT = 554
-DEFAULT_WARMUP_FRAMES = 5  # 保存前に捨てるフレーム数（露光など安定待ち）
+DEFAULT_WARMUP_FRAMES = 0  # 保存前に無条件で捨てるフレーム数（品質採点があるので普段は 0 で OK）
+DEFAULT_BEST_OF = 10  # 採点して選ぶ候補フレームの最大数
 
 
 @dataclass
 class SnapshotConfig:
-    host: str
-    username: str
-    password: str
+    camera: Optional[Camera]
     stream: int = DEFAULT_STREAM
-    port: int = DEFAULT_PORT
     output: Path = Path("snapshot.jpg")
     warmup_frames: int = DEFAULT_WARMUP_FRAMES
+    best_of: int = DEFAULT_BEST_OF
+    hub: Optional[str] = None
 
     def rtsp_url(self) -> str:
-        return f"rtsp://{self.username}:{self.password}@{self.host}:{self.port}/stream{self.stream}"
+        assert self.camera is not None
+        return self.camera.rtsp_url(self.stream)
 
     def safe_display_target(self) -> str:
-        return f"rtsp://{self.host}:{self.port}/stream{self.stream}"
+        if self.hub:
+            return f"hub:{self.hub}"
+        assert self.camera is not None
+        return self.camera.safe_url(self.stream)
 
 
 def parse_args(argv: Optional[list[str]] = None) -> SnapshotConfig:
+    # 接続先（TAPO_HOST など）は tapo_cameras.py が台帳か .env から決めるよ。
     def _optional_str(name: str) -> Optional[str]:
         value = os.getenv(name)
         if value is None:
@@ -93,19 +102,15 @@ def parse_args(argv: Optional[list[str]] = None) -> SnapshotConfig:
             raise SystemExit(f"環境変数 {name} の値 '{v}' を整数に変換できなかったよ。") from exc
 
     env_defaults = {
-        "host": _optional_str("TAPO_HOST"),
-        "username": _optional_str("TAPO_USERNAME"),
-        "password": _optional_str("TAPO_PASSWORD"),
-        "stream": _optional_int("TAPO_STREAM"),
-        "port": _optional_int("TAPO_PORT"),
+        "hub": _optional_str("TAPO_HUB"),
         # 任意: 保存先（指定がなければ自動で日付入りファイル名を作る）
         "output": _optional_str("TAPO_SNAPSHOT_PATH"),
         "warmup": _optional_int("TAPO_WARMUP_FRAMES"),
+        "best_of": _optional_int("TAPO_BEST_OF"),
     }
 
-    default_stream = env_defaults["stream"] if env_defaults["stream"] is not None else DEFAULT_STREAM
-    default_port = env_defaults["port"] if env_defaults["port"] is not None else DEFAULT_PORT
     default_warmup = env_defaults["warmup"] if env_defaults["warmup"] is not None else DEFAULT_WARMUP_FRAMES
+    default_best_of = env_defaults["best_of"] if env_defaults["best_of"] is not None else DEFAULT_BEST_OF
 
     # 出力ファイルのデフォルト: snapshot_YYYYmmdd_HHMMSS.jpg
     default_output = env_defaults["output"]
@@ -113,23 +118,22 @@ def parse_args(argv: Optional[list[str]] = None) -> SnapshotConfig:
         default_output = f"snapshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
 
     parser = argparse.ArgumentParser(description="Tapo C210 から 1 枚だけ画像を保存するツールだよ。")
-    parser.add_argument("--host", required=env_defaults["host"] is None, default=env_defaults["host"], help="カメラの IPv4 アドレスまたはホスト名")
-    parser.add_argument("--username", required=env_defaults["username"] is None, default=env_defaults["username"], help="カメラアカウントのユーザー名")
-    parser.add_argument("--password", required=env_defaults["password"] is None, default=env_defaults["password"], help="カメラアカウントのパスワード")
-    parser.add_argument("--stream", type=int, default=default_stream, choices=(1, 2, 6, 7), help="RTSP ストリーム番号 (1=メイン HD, 2=サブ, 6/7=デュアルレンズ)")
-    parser.add_argument("--port", type=int, default=default_port, help="RTSP ポート番号 (既定値 554)")
+    add_camera_arguments(parser)
     parser.add_argument("--output", type=Path, default=Path(default_output), help="保存する画像のパス (.jpg/.png など)")
-    parser.add_argument("--warmup-frames", type=int, default=default_warmup, help="保存前に捨てるフレーム数（露光や AWB の安定待ち）")
+    parser.add_argument("--warmup-frames", type=int, default=default_warmup, help="採点の前に無条件で捨てるフレーム数")
+    parser.add_argument("--best-of", type=int, default=default_best_of, help="最大この枚数を採点して、いちばん写りのいいフレームを保存するよ（ボケ・露出・露出調整中を判定）")
+    parser.add_argument("--hub", default=env_defaults["hub"], help="カメラに直接つながず、frame_hub.py のハブ（名前を指定）から 1 枚もらうよ")
 
     args = parser.parse_args(argv)
+    # スナップショットは画質優先なので、台帳の「視聴用」ストリーム（既定はメイン HD）を使うよ
+    camera, stream = (None, args.stream or DEFAULT_STREAM) if args.hub else resolve_camera(parser, args, role="view")
     return SnapshotConfig(
-        host=args.host,
-        username=args.username,
-        password=args.password,
-        stream=args.stream,
-        port=args.port,
+        camera=camera,
+        stream=stream,
         output=args.output,
         warmup_frames=args.warmup_frames,
+        best_of=args.best_of,
+        hub=args.hub,
     )
 
 
@@ -144,10 +148,10 @@ def open_capture(url: str) -> Optional["cv2.VideoCapture"]:
 
 
 def take_snapshot(config: SnapshotConfig) -> None:
-    url = config.rtsp_url()
+    url = None if config.hub else config.rtsp_url()
     print(f"{config.safe_display_target()!r} に接続して 1 枚だけ保存するよ…")
 
-    cap = open_capture(url)
+    cap = open_hub_capture(config.hub) if config.hub else open_capture(url)
     if cap is None:
         raise SystemExit("RTSP ストリームを開けなかったよ。IP・認証情報・RTSP 設定を確認してね。")
 
@@ -158,9 +162,28 @@ def take_snapshot(config: SnapshotConfig) -> None:
             if not ok:
                 raise SystemExit("フレームを読み取れなかったよ。接続や認証情報を確認してね。")
 
-        ok, frame = cap.read()
-        if not ok or frame is None:
+        # 決め打ちで読み飛ばす代わりに、候補を採点していちばんいいフレームを選ぶよ。
+        # 合格点のフレームが来たらそこで打ち切るので、昼間はすぐ終わるの。
+        scorer = FrameQualityScorer()
+        best = None
+        best_quality = None
+        for index in range(max(1, config.best_of)):
+            ok, candidate = cap.read()
+            if not ok or candidate is None:
+                break
+            quality = scorer.score(candidate)
+            if best_quality is None or quality.score > best_quality.score:
+                best, best_quality = candidate, quality
+            # 1 枚目は前フレームがなくて露出の安定度がわからないから、2 枚目以降で判定するよ
+            if quality.ok and index >= 1:
+                break
+        if best is None or best_quality is None:
             raise SystemExit("フレームを取得できなかったよ。もう一度試してみてね。")
+        frame = best
+        print(
+            f"{index + 1} 枚を採点して選んだよ（スコア {best_quality.score:.2f}, "
+            f"シャープさ {best_quality.sharpness:.0f}, 明るさ {best_quality.brightness:.0f}, 判定 {best_quality.reason}）"
+        )
 
         # 保存先ディレクトリを用意
         config.output.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,117 @@
+"""カメラ台帳（``app/config/cameras.toml``）から接続先を決める、各スクリプト共通のヘルパーだよ📒
+
+台帳そのもの（読み込み・検証・``${VAR}`` 展開・ホットリロード）は ``app/gateway/cameras.py`` にあって、
+ゲートウェイや MediaMTX のパス生成と同じものを使うよ。ここではそれを argparse につなぐだけ。
+
+台帳の探し方（先に見つかったものを使う）:
+
+1. ``--cameras-file`` / 環境変数 ``CAMERAS_FILE``
+2. リポジトリの ``app/config/cameras.toml``
+3. どちらもなければ、これまで通り ``.env`` の ``TAPO_HOST`` / ``TAPO_USERNAME`` / ``TAPO_PASSWORD``
+   / ``TAPO_PORT`` / ``TAPO_STREAM`` から ``cam`` という 1 台だけの台帳を作るよ
+
+``--host`` などを付けると、台帳の値をその場で上書きできるよ。
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import os
+import sys
+from pathlib import Path
+from typing import Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+GATEWAY_DIR = REPO_ROOT / "app" / "gateway"
+DEFAULT_REGISTRY = REPO_ROOT / "app" / "config" / "cameras.toml"
+
+if str(GATEWAY_DIR) not in sys.path:
+    # 末尾に足すので、このディレクトリのモジュールが隠れることはないよ
+    sys.path.append(str(GATEWAY_DIR))
+
+from cameras import Camera, CameraRegistry, RegistryError, RegistryWatcher  # noqa: E402
+
+__all__ = [
+    "Camera",
+    "CameraRegistry",
+    "RegistryError",
+    "RegistryWatcher",
+    "add_camera_arguments",
+    "registry_path",
+    "load_registry",
+    "resolve_camera",
+]
+
+
+def _env(name: str) -> Optional[str]:
+    value = (os.getenv(name) or "").strip()
+    return value or None
+
+
+def add_camera_arguments(parser: argparse.ArgumentParser, *, camera_help: Optional[str] = None) -> None:
+    """``--camera`` / ``--cameras-file`` と、台帳を上書きする ``--host`` などを追加するよ。"""
+
+    parser.add_argument(
+        "--camera",
+        default=_env("TAPO_CAMERA"),
+        help=camera_help or "台帳のカメラ名（省略時は台帳の先頭のカメラ）",
+    )
+    parser.add_argument("--cameras-file", default=None, help="カメラ台帳のパス（既定: $CAMERAS_FILE → app/config/cameras.toml）")
+    parser.add_argument("--host", default=None, help="カメラの IPv4 アドレスまたはホスト名（台帳を上書き）")
+    parser.add_argument("--username", default=None, help="カメラアカウントのユーザー名（台帳を上書き）")
+    parser.add_argument("--password", default=None, help="カメラアカウントのパスワード（台帳を上書き）")
+    parser.add_argument(
+        "--stream",
+        type=int,
+        default=None,
+        choices=(1, 2, 6, 7),
+        help="RTSP ストリーム番号 (1=メイン HD, 2=サブ, 6/7=デュアルレンズ)。既定は台帳の用途別ストリーム",
+    )
+    parser.add_argument("--port", type=int, default=None, help="RTSP ポート番号（台帳を上書き）")
+
+
+def registry_path(explicit: Optional[str] = None) -> Optional[Path]:
+    """使う台帳ファイル。なければ ``None``（``TAPO_*`` から作る）だよ。"""
+
+    chosen = explicit or _env("CAMERAS_FILE")
+    if chosen:
+        return Path(chosen)
+    return DEFAULT_REGISTRY if DEFAULT_REGISTRY.exists() else None
+
+
+def load_registry(explicit: Optional[str] = None) -> CameraRegistry:
+    path = registry_path(explicit)
+    if path is not None:
+        return CameraRegistry.load(path)
+    return CameraRegistry.from_env()
+
+
+def resolve_camera(
+    parser: argparse.ArgumentParser, args: argparse.Namespace, *, role: str = "view"
+) -> Tuple[Camera, int]:
+    """引数と台帳から ``(カメラ, ストリーム番号)`` を決めるよ。足りなければ ``parser.error`` で止めるの。"""
+
+    try:
+        registry = load_registry(args.cameras_file)
+        camera: Optional[Camera] = registry.get(args.camera) if (len(registry) or args.camera) else None
+    except RegistryError as exc:
+        if not args.host:
+            parser.error(str(exc))
+        camera = None
+
+    overrides = {
+        key: getattr(args, key)
+        for key in ("host", "username", "password", "port")
+        if getattr(args, key) is not None
+    }
+    if camera is None:
+        if not args.host:
+            parser.error(
+                "カメラが決まらなかったよ。app/config/cameras.toml を用意するか、"
+                ".env に TAPO_HOST / TAPO_USERNAME / TAPO_PASSWORD を設定するか、--host を指定してね"
+            )
+        camera = Camera(name=args.camera or "cam", **overrides)
+    elif overrides:
+        # 固定 URL のカメラに --host を付けたら、URL ではなくホスト指定として扱うよ
+        camera = dataclasses.replace(camera, url=None if "host" in overrides else camera.url, **overrides)
+    return camera, args.stream or camera.stream(role)